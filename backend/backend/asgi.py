@@ -3,6 +3,10 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server (e.g. ``gunicorn backend.asgi:application -k
+uvicorn.workers.UvicornWorker``) so /api/events/ streams run as coroutines
+instead of holding a worker thread per connected client.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -60,10 +60,12 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'shop.db_router.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'shop.ratelimit.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -112,6 +114,109 @@ else:
         }
     }
 
+# Optional read replicas. Only views wrapped in shop.db_router.replica_reads
+# read from them; writes and everything else stay on "default".
+#   Postgres: DB_REPLICA_HOSTS=replica1.internal,replica2.internal
+#   SQLite (local testing): SQLITE_REPLICAS=/path/to/replica.sqlite3
+if os.environ.get("DB_NAME"):
+    replica_hosts = os.environ.get("DB_REPLICA_HOSTS", "")
+    replica_overrides = [{'HOST': host.strip()} for host in replica_hosts.split(",") if host.strip()]
+else:
+    replica_files = os.environ.get("SQLITE_REPLICAS", "")
+    replica_overrides = [{'NAME': path.strip()} for path in replica_files.split(",") if path.strip()]
+
+DATABASE_REPLICAS = []
+for index, override in enumerate(replica_overrides, start=1):
+    alias = f"replica_{index}"
+    DATABASES[alias] = {**DATABASES['default'], **override, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['shop.db_router.PrimaryReplicaRouter']
+# Keep a client on the primary for this long after it writes (covers replica lag).
+DATABASE_REPLICA_PIN_SECONDS = int(os.environ.get("DB_REPLICA_PIN_SECONDS", "5"))
+# Replicas further behind than this (Postgres only) are skipped.
+DATABASE_REPLICA_MAX_LAG = float(os.environ.get("DB_REPLICA_MAX_LAG", "30"))
+DATABASE_REPLICA_HEALTH_INTERVAL = float(os.environ.get("DB_REPLICA_HEALTH_INTERVAL", "10"))
+
+
+# Cache
+# Set REDIS_URL to share caches (rate limit buckets etc.) across workers.
+
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ["REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
+# Read endpoint caching with request coalescing (see shop/singleflight.py).
+# Writes invalidate immediately; these bound staleness from other sources.
+CATALOG_CACHE_SECONDS = int(os.environ.get("CATALOG_CACHE_SECONDS", "60"))
+ORDERS_CACHE_SECONDS = int(os.environ.get("ORDERS_CACHE_SECONDS", "10"))
+# Past its TTL an entry is still served for this long while one refresh runs.
+SINGLEFLIGHT_STALE_SECONDS = int(os.environ.get("SINGLEFLIGHT_STALE_SECONDS", "300"))
+SINGLEFLIGHT_LOCK_SECONDS = 30
+SINGLEFLIGHT_WAIT_SECONDS = 5
+# Sales analytics are marked stale (not dropped) on new orders, and served
+# stale for up to ANALYTICS_STALE_SECONDS while they recompute.
+ANALYTICS_CACHE_SECONDS = int(os.environ.get("ANALYTICS_CACHE_SECONDS", "300"))
+ANALYTICS_STALE_SECONDS = int(os.environ.get("ANALYTICS_STALE_SECONDS", "3600"))
+
+
+# Signed access/refresh tokens issued at login (see shop/auth.py). Each process
+# reloads revoked access tokens from the database every
+# AUTH_REVOCATION_CHECK_SECONDS, so logouts reach every worker within that delay.
+AUTH_ACCESS_TOKEN_SECONDS = int(os.environ.get("AUTH_ACCESS_TOKEN_SECONDS", "900"))
+AUTH_REFRESH_TOKEN_SECONDS = int(os.environ.get("AUTH_REFRESH_TOKEN_SECONDS", str(14 * 24 * 3600)))
+AUTH_REVOCATION_ENABLED = os.environ.get("AUTH_REVOCATION_ENABLED", "true").lower() == "true"
+AUTH_REVOCATION_CHECK_SECONDS = float(os.environ.get("AUTH_REVOCATION_CHECK_SECONDS", "5"))
+# Single-use tickets for the admin event stream, which can't send headers and
+# so carries the ticket in its URL (and the access log).
+AUTH_STREAM_TICKET_SECONDS = int(os.environ.get("AUTH_STREAM_TICKET_SECONDS", "30"))
+# Legacy shared admin token, accepted alongside issued tokens only when set.
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+
+# Rate limiting and load shedding (see shop/ratelimit.py)
+
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_CACHE = 'default'
+# Number of proxies (e.g. the ALB) in front of Django that append to X-Forwarded-For.
+RATE_LIMIT_TRUSTED_PROXIES = int(os.environ.get("RATE_LIMIT_TRUSTED_PROXIES", "0"))
+# Token buckets per client and URL name: `rate` requests/second, bursts up to `burst`.
+RATE_LIMIT_DEFAULT = {"rate": 10, "burst": 50}
+RATE_LIMITS = {
+    "products": {"rate": 5, "burst": 30},
+    "product_detail": {"rate": 10, "burst": 50},
+    "user_login": {"rate": 0.1, "burst": 5},
+    "admin_login": {"rate": 0.05, "burst": 5},
+    "user_signup": {"rate": 0.05, "burst": 3},
+    "checkout": {"rate": 1, "burst": 5},
+    "auth_refresh": {"rate": 0.2, "burst": 10},
+}
+# When more requests than this are in flight in one worker process, routes
+# below get a 503 so checkout and cart keep working. 0 disables shedding.
+# Keep it below the threads per worker (GUNICORN_THREADS) or it never triggers.
+LOAD_SHED_MAX_IN_FLIGHT = int(os.environ.get("LOAD_SHED_MAX_IN_FLIGHT", "0"))
+LOAD_SHED_LOW_PRIORITY_ROUTES = {
+    "products", "related_products", "orders", "daily_orders",
+    "catalog_history", "product_history", "stock_velocity", "stock_forecast",
+    "revenue_analytics", "top_products_analytics",
+}
+LOAD_SHED_RETRY_AFTER = 2
+
+# /api/batch/: most sub-requests per call, and how many GETs run at once.
+BATCH_MAX_REQUESTS = int(os.environ.get("BATCH_MAX_REQUESTS", "20"))
+BATCH_MAX_WORKERS = int(os.environ.get("BATCH_MAX_WORKERS", "4"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -154,6 +259,95 @@ STATICFILES_DIRS = [
 ]
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Uploads are stored once per distinct content and served by shop.media.serve.
+STORAGES = {
+    "default": {"BACKEND": "shop.media.ContentAddressedStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+# Uploads larger than this (px on the longest side) are downscaled by a background job.
+PRODUCT_IMAGE_MAX_SIZE = int(os.environ.get("PRODUCT_IMAGE_MAX_SIZE", "1200"))
+
+# /health/ready: per-check deadline, how long a report is reused, and the
+# free space MEDIA_ROOT needs to count as ready.
+HEALTH_CHECK_TIMEOUT = float(os.environ.get("HEALTH_CHECK_TIMEOUT", "2"))
+HEALTH_CACHE_SECONDS = float(os.environ.get("HEALTH_CACHE_SECONDS", "5"))
+HEALTH_MIN_FREE_BYTES = int(os.environ.get("HEALTH_MIN_FREE_BYTES", str(100 * 1024 * 1024)))
+
+
+# Delivered orders older than this are moved to the archive tables by
+# `manage.py archive_orders`, keeping Order/OrderItem small.
+ORDER_ARCHIVE_AFTER_DAYS = int(os.environ.get("ORDER_ARCHIVE_AFTER_DAYS", "365"))
+
+
+# Product feeds (/feeds/products.xml, /feeds/products.csv) and /sitemap.xml,
+# see shop/feeds.py. FEED_BASE_URL is the public origin used in links
+# (defaults to the requesting host); a feed younger than FEED_MIN_AGE_SECONDS
+# is served even if the catalog has changed since. Builds take a file lock in
+# FEEDS_DIR, so processes sharing the directory never build a feed twice at once.
+FEEDS_DIR = Path(os.environ.get("FEEDS_DIR", BASE_DIR / "var" / "feeds"))
+FEED_BASE_URL = os.environ.get("FEED_BASE_URL", "")
+FEED_TITLE = os.environ.get("FEED_TITLE", "Mini Shop")
+FEED_CURRENCY = os.environ.get("FEED_CURRENCY", "USD")
+FEED_MIN_AGE_SECONDS = int(os.environ.get("FEED_MIN_AGE_SECONDS", "900"))
+
+
+# "Frequently bought together" (see shop/recommendations.py); rebuilt by
+# `manage.py build_related_products`, which keeps its state in this directory.
+RECOMMENDATIONS_DIR = Path(os.environ.get("RECOMMENDATIONS_DIR", BASE_DIR / "var" / "recommendations"))
+RECOMMENDATIONS_TOP_K = int(os.environ.get("RECOMMENDATIONS_TOP_K", "10"))
+RECOMMENDATIONS_MIN_CO_PURCHASES = int(os.environ.get("RECOMMENDATIONS_MIN_CO_PURCHASES", "1"))
+
+
+# Email (order confirmations, stock alerts)
+
+EMAIL_BACKEND = os.environ.get("EMAIL_BACKEND", 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.environ.get("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.environ.get("EMAIL_PORT", "25"))
+EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = os.environ.get("EMAIL_USE_TLS", "false").lower() == "true"
+DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "shop@localhost")
+SERVER_EMAIL = DEFAULT_FROM_EMAIL
+ADMINS = [("Admin", email.strip()) for email in os.environ.get("ADMIN_EMAILS", "").split(",") if email.strip()]
+LOW_STOCK_THRESHOLD = int(os.environ.get("LOW_STOCK_THRESHOLD", "5"))
+
+# Restock forecasting (see shop/forecast.py). Sales are weighted by recency
+# with this half-life; products projected to sell out within
+# FORECAST_RISK_DAYS are reported as at risk.
+FORECAST_HISTORY_DAYS = int(os.environ.get("FORECAST_HISTORY_DAYS", "730"))
+FORECAST_HALF_LIFE_DAYS = float(os.environ.get("FORECAST_HALF_LIFE_DAYS", "28"))
+FORECAST_RISK_DAYS = int(os.environ.get("FORECAST_RISK_DAYS", "14"))
+
+
+# Live events (Server-Sent Events at /api/events/, see shop/events.py)
+
+# How often streams check the event table for events from other workers.
+SSE_POLL_INTERVAL = float(os.environ.get("SSE_POLL_INTERVAL", "2"))
+# Turn off for single-process deployments where in-process delivery is enough.
+SSE_DB_POLL = os.environ.get("SSE_DB_POLL", "true").lower() == "true"
+SSE_KEEPALIVE_SECONDS = int(os.environ.get("SSE_KEEPALIVE_SECONDS", "15"))
+# Streams close after this long and the browser reconnects with Last-Event-ID,
+# which bounds how long a WSGI worker thread is held.
+SSE_MAX_STREAM_SECONDS = int(os.environ.get("SSE_MAX_STREAM_SECONDS", "300"))
+SSE_EVENT_RETENTION_HOURS = int(os.environ.get("SSE_EVENT_RETENTION_HOURS", "24"))
+
+
+# Background jobs (see shop/jobs.py and `manage.py run_workers`)
+
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.environ.get("JOB_RETRY_BASE_SECONDS", "5"))
+JOB_RETRY_MAX_SECONDS = float(os.environ.get("JOB_RETRY_MAX_SECONDS", "3600"))
+# Running jobs locked for longer than this are assumed orphaned and requeued.
+JOB_LOCK_TIMEOUT_SECONDS = int(os.environ.get("JOB_LOCK_TIMEOUT_SECONDS", "600"))
+# Jobs the workers enqueue on a schedule: job name -> seconds between runs.
+JOB_SCHEDULE = {
+    "shop.forecast_stock": int(os.environ.get("FORECAST_INTERVAL_SECONDS", str(24 * 3600))),
+}
+# How often each worker requeues stale jobs and enqueues scheduled ones.
+JOB_HOUSEKEEPING_SECONDS = float(os.environ.get("JOB_HOUSEKEEPING_SECONDS", "60"))
+
+# Filtered admin changelist counts are cached this long (see shop/paginators.py).
+ADMIN_COUNT_CACHE_SECONDS = int(os.environ.get("ADMIN_COUNT_CACHE_SECONDS", "60"))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
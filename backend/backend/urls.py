@@ -14,12 +14,13 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
 from django.views.generic import TemplateView
-from shop import views as shop_views
+from shop import feeds, media, views as shop_views
 
 urlpatterns = [
     # Frontend pages (served by Django so frontend+backend run on one server/port)
@@ -36,9 +37,16 @@ urlpatterns = [
 
     # Backend
     path('health/', shop_views.home),
+    re_path(r'^health/live/?$', shop_views.health_live, name="health_live"),
+    re_path(r'^health/ready/?$', shop_views.health_ready, name="health_ready"),
+    path('feeds/products.xml', feeds.product_feed, {"kind": "xml"}, name="product_feed_xml"),
+    path('feeds/products.csv', feeds.product_feed, {"kind": "csv"}, name="product_feed_csv"),
+    path('sitemap.xml', feeds.sitemap_index, name="sitemap"),
+    path('sitemaps/<str:generation>/<str:part>', feeds.sitemap_part, name="sitemap_part"),
     path('admin/', admin.site.urls),
     path('api/', include('shop.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    re_path(rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<path>.+)$', media.serve, name="media"),
+]
 
 # Error handlers
 handler404 = 'shop.views.handler404'
@@ -3,6 +3,9 @@ WSGI config for backend project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
 
+In production run ``gunicorn backend.wsgi`` from the backend directory;
+gunicorn.conf.py there preloads and warms the app before workers fork.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
@@ -0,0 +1,62 @@
+"""Gunicorn settings, picked up automatically when started from this directory:
+
+    gunicorn backend.wsgi
+
+The app is imported once in the master (``preload_app``) and warmed there,
+so forked workers share that memory copy-on-write and start serving without
+paying for imports. ``gc.freeze()`` keeps the garbage collector from
+touching (and so copying) those shared pages in each worker. Each worker
+then fills its own caches before it accepts connections.
+"""
+
+import gc
+import logging
+import multiprocessing
+import os
+
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+# Threaded workers: each /api/events/ stream holds a thread for up to
+# SSE_MAX_STREAM_SECONDS, not a whole worker, and in-flight load shedding
+# (LOAD_SHED_MAX_IN_FLIGHT) has concurrent requests to count.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+# gthread workers heartbeat from their main loop, so this catches a hung
+# worker, not a long stream. With the sync class a request must finish
+# within it, so streams would need SSE_MAX_STREAM_SECONDS below it.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+# Recycle workers now and then so slow leaks can't build up; jitter avoids restarting them all at once.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() == "true"
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+
+logger = logging.getLogger("gunicorn.error")
+
+
+def _log_timings(label, timings):
+    logger.info("%s: %s", label, ", ".join(f"{step} {seconds * 1000:.0f}ms" for step, seconds in timings.items()))
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from django.db import connections
+    from shop import warmup
+
+    _log_timings("Preloaded", warmup.preload())
+    # Sockets must not be shared between forked workers.
+    connections.close_all()
+    gc.collect()
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    from shop import warmup
+
+    timings = {} if preload_app else warmup.preload()
+    timings.update(warmup.warm_worker())
+    _log_timings(f"Worker {worker.pid} warmed", timings)
@@ -1,10 +1,39 @@
+from decimal import Decimal
+
 from django.contrib import admin
-from .models import Product, Order, OrderItem, User, Admin
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+from . import jobs
+from .models import Product, Order, OrderItem, User, Admin, Job, ArchivedOrder, ArchivedOrderItem, ProductChangeLog
+from .paginators import EstimatedCountPaginator
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings that stay fast on tables with millions of rows."""
+
+    paginator = EstimatedCountPaginator
+    # Skip the second, unfiltered COUNT(*) shown as "N total".
+    show_full_result_count = False
+    list_per_page = 50
+
+
+def order_total_subquery(item_model):
+    """Per-order total as a correlated subquery, so only the displayed page is summed."""
+    line_total = ExpressionWrapper(F("price_per_unit") * F("quantity"), output_field=DecimalField())
+    totals = (
+        item_model.objects.filter(order=OuterRef("pk"))
+        .order_by()
+        .values("order")
+        .annotate(total=Sum(line_total))
+        .values("total")
+    )
+    return Subquery(totals, output_field=DecimalField(max_digits=12, decimal_places=2))
 
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
+    # A raw id input instead of a <select> holding every product.
+    raw_id_fields = ("product",)
     readonly_fields = ("product_name", "quantity", "price_per_unit")
 
 
@@ -23,13 +52,89 @@ class AdminUserAdmin(admin.ModelAdmin):
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(LargeTableAdmin):
     list_display = ("name", "price", "stock", "updated_at")
     search_fields = ("name",)
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
-    list_display = ("public_id", "customer_name", "status", "created_at")
+class OrderAdmin(LargeTableAdmin):
+    list_display = ("public_id", "customer_name", "status", "order_total", "created_at")
     list_filter = ("status", "created_at")
+    # Exact matches can use the unique/indexed columns instead of a LIKE scan.
+    search_fields = ("=public_id", "=customer_email")
+    raw_id_fields = ("user",)
+    # No foreign key is displayed (the total is a subquery), so there is nothing to join.
+    list_select_related = False
     inlines = [OrderItemInline]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(total=order_total_subquery(OrderItem))
+
+    @admin.display(description="Total", ordering="total")
+    def order_total(self, obj):
+        return obj.total or Decimal("0.00")
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    can_delete = False
+    raw_id_fields = ("product",)
+    readonly_fields = ("product_name", "quantity", "price_per_unit")
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(LargeTableAdmin):
+    list_display = ("public_id", "customer_name", "status", "order_total", "created_at", "archived_at")
+    search_fields = ("=public_id", "=customer_email")
+    raw_id_fields = ("user",)
+    readonly_fields = ("id", "public_id", "created_at", "archived_at")
+    inlines = [ArchivedOrderItemInline]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(total=order_total_subquery(ArchivedOrderItem))
+
+    @admin.display(description="Total", ordering="total")
+    def order_total(self, obj):
+        return obj.total or Decimal("0.00")
+
+
+@admin.register(ProductChangeLog)
+class ProductChangeLogAdmin(LargeTableAdmin):
+    list_display = ("product_id", "reason", "price", "stock", "stock_delta", "changed_at")
+    list_filter = ("reason",)
+    search_fields = ("=product__id",)
+    raw_id_fields = ("product",)
+
+    # The log is append-only and written by the app.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class JobNameFilter(admin.SimpleListFilter):
+    """Filter by the registered job names instead of a DISTINCT over the job table."""
+
+    title = "name"
+    parameter_name = "name"
+
+    def lookups(self, request, model_admin):
+        return [(name, name) for name in jobs.registered_names()]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(name=self.value())
+        return queryset
+
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdmin):
+    list_display = ("id", "name", "status", "attempts", "run_at", "locked_by")
+    list_filter = ("status", JobNameFilter)
+    readonly_fields = ("created_at", "locked_at", "last_error")
@@ -0,0 +1,148 @@
+"""Sales analytics aggregated in the database.
+
+Each report is one GROUP BY over order lines per table (live and archived
+orders), merged in Python. Results are cached per date range and marked
+stale when new order lines are committed, so readers get the cached answer
+straight away while one request recomputes it in the background.
+"""
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, DateField, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from . import singleflight
+from .models import ArchivedOrderItem, OrderItem, Product
+
+
+NAMESPACE = "sales"
+GRANULARITIES = ("day", "week", "month")
+
+LINE_TOTAL = ExpressionWrapper(F("price_per_unit") * F("quantity"), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _bounds(start, end):
+    """Aware [start, end) datetimes covering the dates ``start`` through ``end``."""
+    return (
+        timezone.make_aware(datetime.combine(start, time.min)),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+    )
+
+
+def _lines(item_model, start, end):
+    since, until = _bounds(start, end)
+    return item_model.objects.filter(order__created_at__gte=since, order__created_at__lt=until).order_by()
+
+
+def _money(value):
+    return float((value or Decimal("0")).quantize(Decimal("0.01")))
+
+
+def _average(revenue, orders):
+    return round(revenue / orders, 2) if orders else 0.0
+
+
+def compute_revenue(start, end, granularity):
+    periods = {}
+    for item_model in (OrderItem, ArchivedOrderItem):
+        rows = (
+            _lines(item_model, start, end)
+            .annotate(period=Trunc("order__created_at", granularity, output_field=DateField()))
+            .values("period")
+            .annotate(revenue=Sum(LINE_TOTAL), units=Sum("quantity"), orders=Count("order_id", distinct=True))
+        )
+        for row in rows:
+            # An order lives in exactly one of the two tables, so the counts add up.
+            total = periods.setdefault(row["period"], {"revenue": Decimal("0"), "units": 0, "orders": 0})
+            total["revenue"] += row["revenue"] or 0
+            total["units"] += row["units"] or 0
+            total["orders"] += row["orders"]
+
+    series = []
+    for period in sorted(periods):
+        total = periods[period]
+        revenue = _money(total["revenue"])
+        series.append(
+            {
+                "period": period.isoformat(),
+                "revenue": revenue,
+                "orders": total["orders"],
+                "units": total["units"],
+                "average_order_value": _average(revenue, total["orders"]),
+            }
+        )
+    revenue = round(sum(row["revenue"] for row in series), 2)
+    orders = sum(row["orders"] for row in series)
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "granularity": granularity,
+        "totals": {
+            "revenue": revenue,
+            "orders": orders,
+            "units": sum(row["units"] for row in series),
+            "average_order_value": _average(revenue, orders),
+        },
+        "series": series,
+    }
+
+
+def compute_top_products(start, end, limit, by):
+    products = {}
+    for item_model in (OrderItem, ArchivedOrderItem):
+        rows = (
+            _lines(item_model, start, end)
+            .filter(product_id__isnull=False)
+            .values("product_id")
+            .annotate(revenue=Sum(LINE_TOTAL), units=Sum("quantity"), orders=Count("order_id", distinct=True))
+        )
+        for row in rows:
+            total = products.setdefault(row["product_id"], {"revenue": Decimal("0"), "units": 0, "orders": 0})
+            total["revenue"] += row["revenue"] or 0
+            total["units"] += row["units"] or 0
+            total["orders"] += row["orders"]
+
+    ranked = sorted(products.items(), key=lambda item: (-item[1][by], item[0]))[:limit]
+    names = dict(Product.objects.filter(id__in=[pid for pid, _ in ranked]).values_list("id", "name"))
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "by": by,
+        "results": [
+            {
+                "product_id": product_id,
+                "name": names.get(product_id),
+                "revenue": _money(total["revenue"]),
+                "units": total["units"],
+                "orders": total["orders"],
+            }
+            for product_id, total in ranked
+        ],
+    }
+
+
+def _cached(key, build):
+    return singleflight.cached(
+        NAMESPACE,
+        key,
+        build,
+        getattr(settings, "ANALYTICS_CACHE_SECONDS", 300),
+        getattr(settings, "ANALYTICS_STALE_SECONDS", 3600),
+    )
+
+
+def revenue(start, end, granularity="day"):
+    """Revenue, orders, units and average order value per period between two dates (inclusive)."""
+    return _cached(f"revenue:{start}:{end}:{granularity}", lambda: compute_revenue(start, end, granularity))
+
+
+def top_products(start, end, limit=10, by="revenue"):
+    """Best-selling products between two dates (inclusive), ranked by revenue or units."""
+    return _cached(f"top:{start}:{end}:{limit}:{by}", lambda: compute_top_products(start, end, limit, by))
+
+
+def orders_changed():
+    singleflight.mark_stale(NAMESPACE)
@@ -0,0 +1,64 @@
+"""Move old delivered orders out of the hot ``Order``/``OrderItem`` tables.
+
+Archived rows keep their primary keys, so a batch that is retried after a
+crash simply skips rows already copied.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+
+ARCHIVABLE_STATUS = "Delivered"
+
+ORDER_FIELDS = ["id", "public_id", "user_id", "customer_name", "customer_email", "status", "estimated_delivery", "created_at"]
+ITEM_FIELDS = ["id", "order_id", "product_id", "product_name", "quantity", "price_per_unit"]
+
+
+def archivable_orders(older_than_days):
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    return Order.objects.filter(status=ARCHIVABLE_STATUS, created_at__lt=cutoff)
+
+
+def archive_batch(older_than_days, batch_size=1000) -> int:
+    """Archive up to ``batch_size`` orders in one transaction; returns how many moved."""
+    with transaction.atomic():
+        ids = list(archivable_orders(older_than_days).order_by("id").values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return 0
+        orders = Order.objects.filter(id__in=ids).values(*ORDER_FIELDS)
+        items = OrderItem.objects.filter(order_id__in=ids).values(*ITEM_FIELDS)
+        ArchivedOrder.objects.bulk_create([ArchivedOrder(**row) for row in orders], ignore_conflicts=True)
+        ArchivedOrderItem.objects.bulk_create([ArchivedOrderItem(**row) for row in items], ignore_conflicts=True)
+        OrderItem.objects.filter(order_id__in=ids).delete()
+        Order.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def find_order(public_id):
+    """Look an order up by public id in the hot table, then the archive."""
+    order = Order.objects.filter(public_id=public_id).prefetch_related("items").first()
+    if order is None:
+        order = ArchivedOrder.objects.filter(public_id=public_id).prefetch_related("items").first()
+    return order
+
+
+def order_history(user_id, before=None, limit=20):
+    """A user's orders newest first, hot and archived, keyset-paginated on (created_at, id).
+
+    Each table is read with one indexed query plus one for its items, however
+    many orders the user has. Returns ``(orders, has_more)``.
+    """
+    page = []
+    for model in (Order, ArchivedOrder):
+        orders = model.objects.filter(user_id=user_id)
+        if before is not None:
+            created_at, order_id = before
+            orders = orders.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=order_id))
+        page.extend(orders.order_by("-created_at", "-id").prefetch_related("items")[:limit + 1])
+    page.sort(key=lambda order: (order.created_at, order.id), reverse=True)
+    return page[:limit], len(page) > limit
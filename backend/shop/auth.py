@@ -0,0 +1,197 @@
+"""Signed, stateless access and refresh tokens.
+
+Tokens are ``django.core.signing`` payloads: the claims plus a timestamp,
+HMAC-signed with SECRET_KEY (rotations via SECRET_KEY_FALLBACKS keep old
+tokens valid) and checked in constant time. Verifying one is local, so an
+authenticated request costs no queries beyond the periodic reload below.
+
+Access tokens are short-lived and sent on every call, as
+``Authorization: Bearer <token>`` or, for the admin pages, ``X-Admin-Token``.
+Refresh tokens only go to /api/auth/refresh/, which rotates them. Stream
+tickets stand in for the access token in EventSource URLs, which end up in
+access logs: they expire within seconds and work once.
+
+Revoked token ids are stored in ``RevokedToken``. Access tokens revoked at
+logout are also kept in memory: each process reloads the unexpired ones
+from the database at most every ``AUTH_REVOCATION_CHECK_SECONDS``, so a
+logout reaches every worker within that delay without a shared cache. The
+set stays small because access tokens expire within minutes. Used refresh
+tokens and tickets are only checked in the database, by ``refresh()`` and
+``redeem_ticket()``.
+"""
+
+import threading
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+from .models import RevokedToken
+
+
+ACCESS = RevokedToken.ACCESS
+REFRESH = RevokedToken.REFRESH
+TICKET = RevokedToken.TICKET
+USER = "user"
+ADMIN = "admin"
+SALTS = {ACCESS: "shop.auth.access", REFRESH: "shop.auth.refresh", TICKET: "shop.auth.ticket"}
+
+_revoked = frozenset()
+_revoked_loaded_at = None
+_revoked_lock = threading.Lock()
+
+
+def _lifetime(kind):
+    if kind == ACCESS:
+        return getattr(settings, "AUTH_ACCESS_TOKEN_SECONDS", 900)
+    if kind == TICKET:
+        return getattr(settings, "AUTH_STREAM_TICKET_SECONDS", 30)
+    return getattr(settings, "AUTH_REFRESH_TOKEN_SECONDS", 14 * 24 * 3600)
+
+
+def _sign(kind, subject, role):
+    expires = int(time.time()) + _lifetime(kind)
+    claims = {"sub": subject, "role": role, "jti": uuid.uuid4().hex, "exp": expires}
+    return signing.dumps(claims, salt=SALTS[kind])
+
+
+def issue(subject, role):
+    """A new access/refresh token pair for ``subject`` (a User or Admin id) as a JSON-ready dict."""
+    return {
+        "access_token": _sign(ACCESS, subject, role),
+        "refresh_token": _sign(REFRESH, subject, role),
+        "token_type": "Bearer",
+        "expires_in": _lifetime(ACCESS),
+    }
+
+
+def _revoked_ids():
+    """This process's copy of the revoked, unexpired access token ids."""
+    global _revoked, _revoked_loaded_at
+    now = time.monotonic()
+    loaded_at = _revoked_loaded_at
+    if loaded_at is not None and now - loaded_at < getattr(settings, "AUTH_REVOCATION_CHECK_SECONDS", 5):
+        return _revoked
+    with _revoked_lock:
+        if _revoked_loaded_at is not loaded_at:
+            return _revoked  # Another thread just reloaded.
+        try:
+            _revoked = frozenset(
+                RevokedToken.objects.filter(kind=ACCESS, expires_at__gt=timezone.now()).values_list("jti", flat=True)
+            )
+        except Exception:
+            # Keep using the last copy rather than failing every request.
+            pass
+        _revoked_loaded_at = now
+    return _revoked
+
+
+def verify(token, kind=ACCESS):
+    """The token's claims if it is a valid, unexpired, unrevoked ``kind`` token, else None."""
+    if not token:
+        return None
+    try:
+        claims = signing.loads(token, salt=SALTS[kind], max_age=_lifetime(kind))
+    except signing.BadSignature:
+        return None
+    if not isinstance(claims, dict) or claims.get("role") not in (USER, ADMIN):
+        return None
+    if kind == ACCESS and getattr(settings, "AUTH_REVOCATION_ENABLED", True) and claims["jti"] in _revoked_ids():
+        return None
+    return claims
+
+
+def revoke(claims, kind=ACCESS):
+    """Revoke a ``kind`` token everywhere (from its verified claims).
+
+    Returns False if it was already revoked.
+    """
+    global _revoked
+    expires_at = datetime.fromtimestamp(claims["exp"], dt_timezone.utc)
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(jti=claims["jti"], kind=kind, expires_at=expires_at)
+    except IntegrityError:
+        return False
+    # Expired tokens fail verification anyway; keep the table short.
+    RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    if kind == ACCESS:
+        with _revoked_lock:
+            _revoked = _revoked | {claims["jti"]}
+    return True
+
+
+def refresh(refresh_token):
+    """Exchange a refresh token for a new pair, revoking it. None if it isn't valid."""
+    claims = verify(refresh_token, REFRESH)
+    # The unique jti makes this the one use: of two concurrent refreshes, one insert fails.
+    if claims is None or not revoke(claims, REFRESH):
+        return None
+    return issue(claims["sub"], claims["role"])
+
+
+def issue_ticket(claims):
+    """A single-use stream ticket for the holder of the verified access token ``claims``."""
+    return _sign(TICKET, claims["sub"], claims["role"])
+
+
+def redeem_ticket(ticket):
+    """The claims of a valid stream ticket, using it up. None if it isn't valid or was used."""
+    claims = verify(ticket, TICKET)
+    if claims is None or not revoke(claims, TICKET):
+        return None
+    return claims
+
+
+def _request_token(request):
+    header = request.headers.get("Authorization", "")
+    if header[:7].lower() == "bearer ":
+        return header[7:].strip()
+    return request.headers.get("X-Admin-Token")
+
+
+def token_claims(token):
+    """Claims for an access token, or for the legacy static ``ADMIN_TOKEN`` while it is configured."""
+    claims = verify(token)
+    static = getattr(settings, "ADMIN_TOKEN", "")
+    if claims is None and token and static and constant_time_compare(token, static):
+        claims = {"sub": None, "role": ADMIN, "jti": None, "exp": None}
+    return claims
+
+
+def authenticate(request):
+    """The verified claims for ``request``'s access token, or None. Cached on the request."""
+    if not hasattr(request, "_auth_claims"):
+        request._auth_claims = token_claims(_request_token(request))
+    return request._auth_claims
+
+
+def is_admin(request):
+    claims = authenticate(request)
+    return claims is not None and claims["role"] == ADMIN
+
+
+def token_user_id(request):
+    """The customer's id from their access token, or None.
+
+    Reads of a customer's own data use this rather than ``user_id``: the
+    session cookie rides along on cross-origin requests, a bearer token
+    doesn't.
+    """
+    claims = authenticate(request)
+    if claims is not None and claims["role"] == USER:
+        return claims["sub"]
+    return None
+
+
+def user_id(request):
+    """The customer's id from their access token, falling back to the session login."""
+    subject = token_user_id(request)
+    if subject is not None:
+        return subject
+    return request.session.get("user_id") if hasattr(request, "session") else None
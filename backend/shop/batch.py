@@ -0,0 +1,197 @@
+"""Run several API calls in one HTTP request.
+
+POST ``/api/batch/`` with::
+
+    {"requests": [{"id": "products", "method": "GET", "path": "/api/products/"},
+                  {"id": "add", "method": "POST", "path": "/api/cart/", "body": {...}}]}
+
+Each sub-request is resolved against ``shop.urls`` and handed to its view
+with the outer request's session, cookies and headers, so middleware,
+session loading and CORS are paid once. Sub-requests still count against
+their own route's rate limit.
+
+Consecutive GET/HEAD sub-requests run concurrently; anything else runs on
+its own, in order, on the request's thread and database connection, so
+writes are seen by the reads that follow them.
+"""
+
+import contextvars
+import json
+import logging
+import threading
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpRequest, JsonResponse, QueryDict
+from django.urls import resolve
+from django.views.decorators.csrf import csrf_exempt
+
+from . import db_router
+from .db_router import SAFE_METHODS
+from .ratelimit import admit, in_flight
+from .views import corsify, handle_options, parse_json
+
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = "/api/"
+# Streaming, multipart and recursive calls can't be expressed as a JSON sub-request.
+EXCLUDED_ROUTES = {"batch", "event_stream", "product_upload_image"}
+ALLOWED_METHODS = {"GET", "HEAD", "POST", "PATCH", "PUT", "DELETE"}
+
+
+class SubRequestError(Exception):
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def build_subrequest(request, spec):
+    """Make an ``HttpRequest`` for one sub-request that shares ``request``'s session."""
+    if not isinstance(spec, dict):
+        raise SubRequestError(400, "Each sub-request must be an object.")
+    method = str(spec.get("method", "GET")).upper()
+    if method not in ALLOWED_METHODS:
+        raise SubRequestError(405, "Method not allowed.")
+    url = urlsplit(str(spec.get("path", "")))
+    if not url.path.startswith(API_PREFIX):
+        raise SubRequestError(400, f"Path must start with {API_PREFIX}.")
+    try:
+        match = resolve(url.path)
+    except Http404:
+        raise SubRequestError(404, "Not found.")
+    if match.url_name in EXCLUDED_ROUTES:
+        raise SubRequestError(400, "This endpoint can't be batched.")
+
+    sub = HttpRequest()
+    sub.method = method
+    sub.path = sub.path_info = url.path
+    sub.META = {
+        **request.META,
+        "REQUEST_METHOD": method,
+        "PATH_INFO": url.path,
+        "QUERY_STRING": url.query,
+        "CONTENT_TYPE": "application/json",
+    }
+    sub.META.pop("CONTENT_LENGTH", None)
+    sub.GET = QueryDict(url.query)
+    sub.COOKIES = request.COOKIES
+    sub.session = request.session
+    if hasattr(request, "user"):
+        sub.user = request.user
+    sub._body = json.dumps(spec["body"]).encode() if spec.get("body") is not None else b""
+    sub.resolver_match = match
+    return sub
+
+
+def _call(request, spec):
+    try:
+        sub = build_subrequest(request, spec)
+        match = sub.resolver_match
+        # Low-priority sub-routes are shed like the same call made directly.
+        rejected = admit(sub, match.url_name, in_flight(request))
+        response = rejected or match.func(sub, *match.args, **match.kwargs)
+    except SubRequestError as exc:
+        return {"status": exc.status, "body": {"detail": exc.detail}}
+    except Exception:
+        logger.exception("Batched request to %s failed", spec.get("path") if isinstance(spec, dict) else spec)
+        return {"status": 500, "body": {"detail": "Internal server error."}}
+
+    result = {"status": response.status_code}
+    if response.get("Retry-After"):
+        result["retry_after"] = response["Retry-After"]
+    content = response.content
+    if response.get("Content-Type", "").startswith("application/json"):
+        result["body"] = json.loads(content) if content else None
+    else:
+        result["body"] = content.decode(response.charset or "utf-8", errors="replace")
+    return result
+
+
+def _run_concurrently(request, specs, workers):
+    """Run ``specs`` on the request thread plus up to ``workers - 1`` helper threads."""
+    results = [None] * len(specs)
+    pending = iter(enumerate(specs))
+    lock = threading.Lock()
+    context = contextvars.copy_context()
+
+    def drain():
+        while True:
+            with lock:
+                item = next(pending, None)
+            if item is None:
+                return
+            index, spec = item
+            results[index] = _call(request, spec)
+
+    def helper(state):
+        def run():
+            with db_router.routing_state(state):
+                drain()
+
+        try:
+            context.copy().run(run)
+        finally:
+            connections.close_all()
+
+    # Each helper starts from a copy of the request's routing state, so replica
+    # pinning carries over without threads flipping each other's flags.
+    states = [db_router.branch_state() for _ in range(min(workers, len(specs)) - 1)]
+    helpers = [threading.Thread(target=helper, args=(state,), daemon=True) for state in states]
+    for thread in helpers:
+        thread.start()
+    drain()
+    for thread in helpers:
+        thread.join()
+    for state in states:
+        db_router.merge_state(state)
+    return results
+
+
+def run(request, specs):
+    """Execute ``specs`` and return their results in the same order."""
+    workers = getattr(settings, "BATCH_MAX_WORKERS", 4)
+    results = []
+    index = 0
+    while index < len(specs):
+        group_end = index
+        while group_end < len(specs) and _is_safe(specs[group_end]):
+            group_end += 1
+        if group_end - index > 1:
+            results.extend(_run_concurrently(request, specs[index:group_end], workers))
+            index = group_end
+        else:
+            results.append(_call(request, specs[index]))
+            index += 1
+    return results
+
+
+def _is_safe(spec):
+    return isinstance(spec, dict) and str(spec.get("method", "GET")).upper() in SAFE_METHODS
+
+
+@csrf_exempt
+def batch(request):
+    if request.method == "OPTIONS":
+        return handle_options(request)
+
+    if request.method != "POST":
+        return corsify(JsonResponse({"detail": "Method not allowed."}, status=405), request)
+
+    payload = parse_json(request)
+    specs = payload.get("requests") if isinstance(payload, dict) else None
+    if not isinstance(specs, list) or not specs:
+        return corsify(JsonResponse({"detail": "Provide a non-empty 'requests' list."}, status=400), request)
+    max_requests = getattr(settings, "BATCH_MAX_REQUESTS", 20)
+    if len(specs) > max_requests:
+        return corsify(
+            JsonResponse({"detail": f"At most {max_requests} requests per batch."}, status=400), request
+        )
+
+    responses = [
+        {"id": spec.get("id") if isinstance(spec, dict) else None, **result}
+        for spec, result in zip(specs, run(request, specs))
+    ]
+    return corsify(JsonResponse({"responses": responses}), request)
@@ -0,0 +1,234 @@
+"""Primary/replica database routing.
+
+Writes always go to ``default``. Reads only go to a replica when the current
+request was explicitly marked read-only with ``replica_reads`` (or code runs
+inside ``read_from_replicas()``) and no write has happened recently for the
+client, so read-after-write flows like cart and checkout keep seeing their
+own data.
+"""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+
+# Per-request routing state, installed by ReplicaPinningMiddleware.
+_routing = ContextVar("shop_db_routing", default=None)
+
+_health_lock = threading.Lock()
+# alias -> (healthy, checked_at)
+_replica_health = {}
+
+SAFE_METHODS = ("GET", "HEAD")
+
+
+def replica_aliases():
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+def _check_replica(alias) -> bool:
+    """Round-trip the replica and, on Postgres, make sure it isn't lagging too far."""
+    max_lag = getattr(settings, "DATABASE_REPLICA_MAX_LAG", 30)
+    try:
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    "SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+                )
+                lag = cursor.fetchone()[0] or 0
+                return float(lag) <= max_lag
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        return True
+    except Exception:
+        # Drop the broken connection so the next probe reconnects from scratch.
+        try:
+            connections[alias].close()
+        except Exception:
+            pass
+        return False
+
+
+def replica_is_healthy(alias) -> bool:
+    interval = getattr(settings, "DATABASE_REPLICA_HEALTH_INTERVAL", 10)
+    now = time.monotonic()
+    healthy, checked_at = _replica_health.get(alias, (True, None))
+    if checked_at is not None and now - checked_at < interval:
+        return healthy
+    with _health_lock:
+        healthy, checked_at = _replica_health.get(alias, (True, None))
+        if checked_at is None or now - checked_at >= interval:
+            healthy = _check_replica(alias)
+            _replica_health[alias] = (healthy, now)
+    return healthy
+
+
+def mark_replica_unhealthy(alias):
+    """Take a replica out of rotation until its next health check."""
+    _replica_health[alias] = (False, time.monotonic())
+
+
+def pick_replica():
+    """Return a healthy replica alias, or ``default`` when none is usable."""
+    candidates = replica_aliases()
+    random.shuffle(candidates)
+    for alias in candidates:
+        if replica_is_healthy(alias):
+            return alias
+    return DEFAULT_DB_ALIAS
+
+
+class PrimaryReplicaRouter:
+    """Send shop reads to replicas when the current request allows it."""
+
+    replica_apps = {"shop"}
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in self.replica_apps:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        state = _routing.get()
+        if not state or not state["replica_ok"] or state["pinned"] or state["wrote"]:
+            return DEFAULT_DB_ALIAS
+        if state["replica"] is None:
+            # Stick to one replica for the whole request so reads are consistent.
+            state["replica"] = pick_replica()
+        return state["replica"]
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state["wrote"] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive schema changes through replication.
+        return db not in replica_aliases()
+
+
+def _new_state(pinned=False):
+    return {"replica_ok": False, "pinned": pinned, "wrote": False, "replica": None}
+
+
+def branch_state():
+    """A copy of this context's routing state for another thread to use with ``routing_state``.
+
+    Each thread needs its own: ``read_from_replicas`` toggles ``replica_ok``
+    in place, which would leak into reads running concurrently.
+    """
+    state = _routing.get()
+    return None if state is None else dict(state)
+
+
+@contextmanager
+def routing_state(state):
+    """Route with ``state`` inside the block."""
+    token = _routing.set(state)
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+def merge_state(branch):
+    """Carry a write or pin from a branch back, so later reads in the request use the primary."""
+    state = _routing.get()
+    if state is not None and branch is not None:
+        state["wrote"] = state["wrote"] or branch["wrote"]
+        state["pinned"] = state["pinned"] or branch["pinned"]
+
+
+@contextmanager
+def read_from_replicas():
+    """Allow shop reads inside the block to use a replica (e.g. exports, reports)."""
+    state = _routing.get()
+    token = None
+    if state is None:
+        state = _new_state()
+        token = _routing.set(state)
+    previous = state["replica_ok"]
+    state["replica_ok"] = True
+    try:
+        yield
+    finally:
+        state["replica_ok"] = previous
+        if token is not None:
+            _routing.reset(token)
+
+
+def replica_reads(view):
+    """Mark a view's GET/HEAD requests as safe to serve from a read replica.
+
+    If the chosen replica fails mid-request it is taken out of rotation and
+    the view is retried once against the primary.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return view(request, *args, **kwargs)
+        with read_from_replicas():
+            try:
+                return view(request, *args, **kwargs)
+            except DatabaseError:
+                state = _routing.get()
+                alias = state["replica"]
+                if alias in (None, DEFAULT_DB_ALIAS):
+                    raise
+                mark_replica_unhealthy(alias)
+                connections[alias].close()
+                state["replica"] = DEFAULT_DB_ALIAS
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaPinningMiddleware:
+    """Pin a client to the primary for a short window after it writes.
+
+    The pin is a plain expiry-timestamp cookie, so honouring it costs no
+    database or session lookup. It only has to outlive typical replica lag.
+    """
+
+    cookie_name = "shop_db_pin"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = False
+        try:
+            pinned = float(request.COOKIES.get(self.cookie_name, 0)) > time.time()
+        except ValueError:
+            pass
+        state = _new_state(pinned=pinned)
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+        pin_seconds = getattr(settings, "DATABASE_REPLICA_PIN_SECONDS", 5)
+        if state["wrote"] and replica_aliases() and pin_seconds > 0:
+            response.set_cookie(
+                self.cookie_name,
+                str(time.time() + pin_seconds),
+                max_age=pin_seconds,
+                httponly=True,
+                samesite=settings.SESSION_COOKIE_SAMESITE,
+                secure=settings.SESSION_COOKIE_SECURE,
+            )
+        return response
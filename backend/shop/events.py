@@ -0,0 +1,188 @@
+"""Live change events for the Server-Sent Events stream.
+
+Events are written to ``shop.Event`` once the surrounding transaction commits
+and handed straight to listeners in the same process. Listeners in other
+worker processes pick them up by polling the table for ids newer than the
+last one they sent, which is also how clients resume with ``Last-Event-ID``.
+"""
+
+import asyncio
+import json
+import queue
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from .jobs import enqueue
+from .models import Event
+
+
+FETCH_LIMIT = 200
+
+
+_subscribers = set()
+_subscribers_lock = threading.Lock()
+
+
+class _Subscriber:
+    """A listener fed from publishing threads; works for sync and asyncio consumers."""
+
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.queue = asyncio.Queue() if loop else queue.Queue()
+
+    def notify(self, event):
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+        else:
+            self.queue.put_nowait(event)
+
+    def __enter__(self):
+        with _subscribers_lock:
+            _subscribers.add(self)
+        return self
+
+    def __exit__(self, *exc):
+        with _subscribers_lock:
+            _subscribers.discard(self)
+
+
+def _broadcast(event):
+    with _subscribers_lock:
+        subscribers = list(_subscribers)
+    for subscriber in subscribers:
+        try:
+            subscriber.notify(event)
+        except RuntimeError:
+            # The subscriber's event loop already closed.
+            pass
+
+
+def _record(kind, data, order_public_id):
+    event = Event.objects.create(kind=kind, data=data, order_public_id=order_public_id)
+    _broadcast(event)
+    if event.id % 500 == 0:
+        enqueue("shop.prune_events")
+
+
+def publish(kind, data, order_public_id=None):
+    """Emit an event once the current transaction commits (immediately outside one)."""
+    transaction.on_commit(lambda: _record(kind, data, order_public_id))
+
+
+class EventFilter:
+    """Which events a stream may see: admins get everything, others a public subset."""
+
+    public_kinds = {Event.STOCK_CHANGED}
+
+    def __init__(self, is_admin=False, order_public_id=None):
+        self.is_admin = is_admin
+        self.order_public_id = order_public_id
+
+    def matches(self, event):
+        if self.is_admin:
+            return True
+        if self.order_public_id:
+            return str(event.order_public_id) == str(self.order_public_id)
+        return event.kind in self.public_kinds
+
+    def queryset(self, after_id):
+        events = Event.objects.filter(id__gt=after_id).order_by("id")
+        if self.is_admin:
+            return events
+        if self.order_public_id:
+            return events.filter(order_public_id=self.order_public_id)
+        return events.filter(kind__in=self.public_kinds)
+
+
+def latest_event_id():
+    return Event.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+
+def fetch_since(event_filter, after_id):
+    return list(event_filter.queryset(after_id)[:FETCH_LIMIT])
+
+
+def format_event(event) -> str:
+    return f"id: {event.id}\nevent: {event.kind}\ndata: {json.dumps(event.data)}\n\n"
+
+
+def _is_next(event, last_id, db_poll):
+    # A jump in ids means another worker published in between; read the gap from the table.
+    return not db_poll or event.id == last_id + 1
+
+
+def _stream_settings():
+    return (
+        getattr(settings, "SSE_POLL_INTERVAL", 2.0),
+        getattr(settings, "SSE_DB_POLL", True),
+        getattr(settings, "SSE_KEEPALIVE_SECONDS", 15),
+        getattr(settings, "SSE_MAX_STREAM_SECONDS", 300),
+    )
+
+
+def stream(event_filter, last_id):
+    """Blocking event stream for WSGI workers."""
+    poll_interval, db_poll, keepalive, max_seconds = _stream_settings()
+    with _Subscriber() as subscriber:
+        yield f"retry: {int(poll_interval * 1000)}\n\n"
+        deadline = time.monotonic() + max_seconds
+        last_write = time.monotonic()
+        pending = fetched = fetch_since(event_filter, last_id)
+        while True:
+            for event in pending:
+                if event.id > last_id and event_filter.matches(event):
+                    last_id = event.id
+                    last_write = time.monotonic()
+                    yield format_event(event)
+            if time.monotonic() >= deadline:
+                return
+            if len(fetched) >= FETCH_LIMIT:
+                # Still catching up on a backlog.
+                pending = fetched = fetch_since(event_filter, last_id)
+                continue
+            fetched = []
+            try:
+                event = subscriber.queue.get(timeout=poll_interval)
+                pending = [event] if _is_next(event, last_id, db_poll) else fetch_since(event_filter, last_id)
+            except queue.Empty:
+                pending = fetched = fetch_since(event_filter, last_id) if db_poll else []
+                if not pending and time.monotonic() - last_write >= keepalive:
+                    last_write = time.monotonic()
+                    yield ": keepalive\n\n"
+
+
+async def astream(event_filter, last_id):
+    """Non-blocking event stream for ASGI servers; one task per client, no thread held."""
+    poll_interval, db_poll, keepalive, max_seconds = _stream_settings()
+    loop = asyncio.get_running_loop()
+    afetch = sync_to_async(fetch_since)
+    with _Subscriber(loop) as subscriber:
+        yield f"retry: {int(poll_interval * 1000)}\n\n"
+        deadline = loop.time() + max_seconds
+        last_write = loop.time()
+        pending = fetched = await afetch(event_filter, last_id)
+        while True:
+            for event in pending:
+                if event.id > last_id and event_filter.matches(event):
+                    last_id = event.id
+                    last_write = loop.time()
+                    yield format_event(event)
+            if loop.time() >= deadline:
+                return
+            if len(fetched) >= FETCH_LIMIT:
+                # Still catching up on a backlog.
+                pending = fetched = await afetch(event_filter, last_id)
+                continue
+            fetched = []
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=poll_interval)
+                pending = [event] if _is_next(event, last_id, db_poll) else await afetch(event_filter, last_id)
+            except asyncio.TimeoutError:
+                pending = fetched = await afetch(event_filter, last_id) if db_poll else []
+                if not pending and loop.time() - last_write >= keepalive:
+                    last_write = loop.time()
+                    yield ": keepalive\n\n"
@@ -0,0 +1,482 @@
+"""Product feeds for marketplaces and sitemaps for crawlers.
+
+Each feed comes from one ``.iterator()`` pass over the catalog, written
+batch by batch through gzip into a new generation directory under
+``FEEDS_DIR`` and published by atomically replacing that feed's
+``current.json``. Nothing holds more than one batch of products, so memory
+stays flat however large the catalog is.
+
+A published generation is served until the catalog changes, judged by the
+product count and latest ``updated_at``. That query only runs when this
+process's "catalog" cache version moves (or every ``FINGERPRINT_TTL``
+seconds), and ``FEED_MIN_AGE_SECONDS`` keeps a busy catalog from triggering
+a rebuild on every request.
+"""
+
+import csv
+import fcntl
+import gzip
+import io
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from itertools import islice
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from . import singleflight
+from .models import Product
+
+
+BATCH_SIZE = 2000
+# zlib's default level; 9 is several times slower for a few percent smaller files.
+COMPRESS_LEVEL = 6
+# The sitemap protocol allows at most this many URLs per file.
+SITEMAP_MAX_URLS = 50_000
+FINGERPRINT_TTL = 60
+# Characters XML 1.0 does not allow, even escaped.
+INVALID_XML_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+_fingerprint = None  # (catalog version, fingerprint, checked_at)
+
+
+class FeedBusy(Exception):
+    """Another process is generating this feed."""
+
+
+def _text(value):
+    return escape(INVALID_XML_RE.sub("", value or ""))
+
+
+def _product_url(base_url, product_id):
+    return f"{base_url}/product.html?id={product_id}"
+
+
+def _image_url(base_url, image, image_url):
+    if not image:
+        return image_url or ""
+    url = default_storage.url(image)
+    return url if "://" in url else f"{base_url}{url}"
+
+
+class FeedKind:
+    """How to write one feed: which fields to read and the text around and per product."""
+
+    fields = ("id", "name", "description", "price", "stock", "image", "image_url")
+    content_type = "application/xml"
+    extension = "xml"
+    max_per_part = None
+
+    def header(self, base_url):
+        return ""
+
+    def rows(self, products, base_url):
+        raise NotImplementedError
+
+    def footer(self):
+        return ""
+
+
+class MerchantXml(FeedKind):
+    """Google Merchant Center RSS 2.0 feed."""
+
+    def header(self, base_url):
+        title = _text(getattr(settings, "FEED_TITLE", "Shop"))
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0">\n'
+            f"<channel>\n<title>{title}</title>\n<link>{_text(base_url)}/</link>\n"
+            f"<description>{title} products</description>\n"
+        )
+
+    def rows(self, products, base_url):
+        currency = getattr(settings, "FEED_CURRENCY", "USD")
+        return "".join(
+            "<item>"
+            f"<g:id>{product_id}</g:id>"
+            f"<g:title>{_text(name)}</g:title>"
+            f"<g:description>{_text(description)}</g:description>"
+            f"<g:link>{_text(_product_url(base_url, product_id))}</g:link>"
+            f"<g:image_link>{_text(_image_url(base_url, image, image_url))}</g:image_link>"
+            f"<g:availability>{'in_stock' if stock > 0 else 'out_of_stock'}</g:availability>"
+            f"<g:price>{price:.2f} {currency}</g:price>"
+            "<g:condition>new</g:condition>"
+            "</item>\n"
+            for product_id, name, description, price, stock, image, image_url in products
+        )
+
+    def footer(self):
+        return "</channel>\n</rss>\n"
+
+
+class MerchantCsv(FeedKind):
+    """The same feed as CSV, with Merchant Center's attribute names as the header row."""
+
+    content_type = "text/csv; charset=utf-8"
+    extension = "csv"
+    columns = ["id", "title", "description", "link", "image_link", "availability", "price", "condition"]
+
+    def _lines(self, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(rows)
+        return buffer.getvalue()
+
+    def header(self, base_url):
+        return self._lines([self.columns])
+
+    def rows(self, products, base_url):
+        currency = getattr(settings, "FEED_CURRENCY", "USD")
+        return self._lines(
+            [
+                product_id,
+                name,
+                description,
+                _product_url(base_url, product_id),
+                _image_url(base_url, image, image_url),
+                "in_stock" if stock > 0 else "out_of_stock",
+                f"{price:.2f} {currency}",
+                "new",
+            ]
+            for product_id, name, description, price, stock, image, image_url in products
+        )
+
+
+class Sitemap(FeedKind):
+    """Product page sitemaps, split into files of at most 50,000 URLs."""
+
+    fields = ("id", "updated_at")
+    max_per_part = SITEMAP_MAX_URLS
+
+    def header(self, base_url):
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        )
+
+    def rows(self, products, base_url):
+        return "".join(
+            f"<url><loc>{_text(_product_url(base_url, product_id))}</loc>"
+            f"<lastmod>{updated_at.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}</lastmod></url>\n"
+            for product_id, updated_at in products
+        )
+
+    def footer(self):
+        return "</urlset>\n"
+
+
+KINDS = {"xml": MerchantXml(), "csv": MerchantCsv(), "sitemap": Sitemap()}
+
+
+def feeds_dir(kind):
+    return Path(getattr(settings, "FEEDS_DIR", settings.BASE_DIR / "var" / "feeds")) / kind
+
+
+def read_meta(kind):
+    try:
+        return json.loads((feeds_dir(kind) / "current.json").read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def catalog_fingerprint():
+    """Product count and latest ``updated_at``, re-read when the catalog cache version changes."""
+    global _fingerprint
+    version = singleflight.version("catalog")
+    if _fingerprint is not None:
+        cached_version, fingerprint, checked_at = _fingerprint
+        if cached_version == version and time.monotonic() - checked_at < FINGERPRINT_TTL:
+            return fingerprint
+    stats = Product.objects.aggregate(count=Count("id"), updated=Max("updated_at"))
+    fingerprint = f"{stats['count']}:{stats['updated'].isoformat() if stats['updated'] else ''}"
+    _fingerprint = (version, fingerprint, time.monotonic())
+    return fingerprint
+
+
+def current(kind, base_url):
+    """The published generation's metadata if it can be served as is, else None."""
+    meta = read_meta(kind)
+    if meta is None or meta["base_url"] != base_url:
+        return None
+    if time.time() - meta["generated_at"] < getattr(settings, "FEED_MIN_AGE_SECONDS", 900):
+        return meta
+    return meta if meta["fingerprint"] == catalog_fingerprint() else None
+
+
+class _Part:
+    """One gzip output file. ``take()`` returns the compressed bytes written since the last call."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.pending = []
+        self.count = 0
+        # mtime=0 so identical content compresses to identical bytes.
+        self.gzip = gzip.GzipFile(filename="", mode="wb", compresslevel=COMPRESS_LEVEL, fileobj=self, mtime=0)
+
+    def write(self, data):
+        # Called by GzipFile with compressed output.
+        self.file.write(data)
+        self.pending.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        self.file.flush()
+
+    def text(self, text):
+        if text:
+            self.gzip.write(text.encode())
+
+    def take(self):
+        data, self.pending = b"".join(self.pending), []
+        return data
+
+    def close(self):
+        self.gzip.close()
+        self.file.close()
+
+
+def _publish(kind, meta):
+    directory = feeds_dir(kind)
+    temp = directory / f".current-{uuid.uuid4().hex}.json"
+    temp.write_text(json.dumps(meta))
+    os.replace(temp, directory / "current.json")
+    # Keep the previous generation for clients that are still reading it.
+    keep = {meta["generation"], meta.get("previous")}
+    for path in directory.iterdir():
+        if path.is_dir() and path.name not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def build(kind, base_url):
+    """Write a new generation of ``kind`` and publish it when done.
+
+    A generator: it yields the compressed bytes as they're written, so a
+    single-file feed can be streamed to a client while it's saved. Closing it
+    early discards the generation.
+    """
+    spec = KINDS[kind]
+    # Read before the products, so changes made during the build trigger the next one.
+    fingerprint = catalog_fingerprint()
+    started = time.time()
+    generation = f"{int(started)}-{uuid.uuid4().hex[:8]}"
+    directory = feeds_dir(kind) / generation
+    directory.mkdir(parents=True)
+    parts, part, total = [], None, 0
+    try:
+        rows = Product.objects.order_by("id").values_list(*spec.fields).iterator(chunk_size=BATCH_SIZE)
+        batch = list(islice(rows, BATCH_SIZE))
+        while True:
+            if part is None or (spec.max_per_part and part.count >= spec.max_per_part):
+                if part is not None:
+                    part.text(spec.footer())
+                    part.close()
+                    yield part.take()
+                part = _Part(directory / f"{kind}-{len(parts) + 1}.{spec.extension}.gz")
+                parts.append(part.path.name)
+                part.text(spec.header(base_url))
+            room = min(len(batch), spec.max_per_part - part.count) if spec.max_per_part else len(batch)
+            part.text(spec.rows(batch[:room], base_url))
+            part.count += room
+            total += room
+            del batch[:room]
+            yield part.take()
+            if not batch:
+                batch = list(islice(rows, BATCH_SIZE))
+                if not batch:
+                    break
+        part.text(spec.footer())
+        part.close()
+        yield part.take()
+    except BaseException:
+        if part is not None:
+            part.file.close()
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+    previous = read_meta(kind)
+    _publish(
+        kind,
+        {
+            "generation": generation,
+            "previous": previous["generation"] if previous else None,
+            "fingerprint": fingerprint,
+            "base_url": base_url,
+            "parts": parts,
+            "products": total,
+            "generated_at": started,
+            "seconds": round(time.time() - started, 3),
+        },
+    )
+
+
+def _locked(lock_file, chunks):
+    """Run ``chunks`` (a build) holding the feed's lock, releasing it however the build ends."""
+    try:
+        yield from chunks
+    finally:
+        lock_file.close()
+
+
+def try_build(kind, base_url):
+    """``build()`` under a cross-process lock, or None when another build is running.
+
+    The lock is an ``flock`` on a file beside the generations, so every
+    process sharing ``FEEDS_DIR`` sees it, and the OS releases it if the
+    builder dies.
+    """
+    directory = feeds_dir(kind)
+    directory.mkdir(parents=True, exist_ok=True)
+    lock_file = open(directory / ".lock", "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return _locked(lock_file, build(kind, base_url))
+
+
+def generate(kind, base_url, force=False):
+    """Make sure ``kind`` is current, building it if needed. Returns its metadata."""
+    if not force:
+        meta = current(kind, base_url)
+        if meta is not None:
+            return meta
+    chunks = try_build(kind, base_url)
+    if chunks is None:
+        raise FeedBusy(f"The {kind} feed is already being generated.")
+    for _ in chunks:
+        pass
+    return read_meta(kind)
+
+
+def base_url_for(request):
+    return (getattr(settings, "FEED_BASE_URL", "") or request.build_absolute_uri("/")).rstrip("/")
+
+
+def _accepts_gzip(request):
+    return "gzip" in request.headers.get("Accept-Encoding", "")
+
+
+def _decompressed(path):
+    with gzip.open(path, "rb") as file:
+        while chunk := file.read(64 * 1024):
+            yield chunk
+
+
+def _busy():
+    response = HttpResponse("Feed is being generated, try again shortly.", status=503, content_type="text/plain")
+    response["Retry-After"] = "30"
+    return response
+
+
+def _serve(request, path, content_type, etag, last_modified, immutable=False, encoded=True):
+    """Send a stored gzip file, as-is (``encoded=False``: the .gz itself) or as gzip content-encoding."""
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        if not encoded:
+            response = FileResponse(open(path, "rb"), content_type="application/gzip")
+        elif _accepts_gzip(request):
+            response = FileResponse(open(path, "rb"), content_type=content_type)
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = StreamingHttpResponse(_decompressed(path), content_type=content_type)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = "public, max-age=31536000, immutable" if immutable else "public, max-age=300"
+    # FileResponse guesses these from the file name; the feed is served under its own URL.
+    response.headers.pop("Content-Disposition", None)
+    if encoded:
+        patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
+def _usable(kind, base_url):
+    """The last published generation, while a new one is being built."""
+    meta = read_meta(kind)
+    return meta if meta is not None and meta["base_url"] == base_url else None
+
+
+@require_safe
+def product_feed(request, kind):
+    """``/feeds/products.xml`` and ``/feeds/products.csv``: the whole catalog in one gzip-encoded file."""
+    base_url = base_url_for(request)
+    meta = current(kind, base_url)
+    if meta is None:
+        if _accepts_gzip(request) and request.method == "GET":
+            chunks = try_build(kind, base_url)
+            if chunks is not None:
+                # Stream the new feed while it's written to disk.
+                response = StreamingHttpResponse(chunks, content_type=KINDS[kind].content_type)
+                response["Content-Encoding"] = "gzip"
+                response["Cache-Control"] = "no-cache"
+                patch_vary_headers(response, ["Accept-Encoding"])
+                return response
+        else:
+            try:
+                meta = generate(kind, base_url, force=True)
+            except FeedBusy:
+                pass
+        meta = meta or _usable(kind, base_url)
+        if meta is None:
+            return _busy()
+    path = feeds_dir(kind) / meta["generation"] / meta["parts"][0]
+    return _serve(request, path, KINDS[kind].content_type, f'"{meta["generation"]}"', int(meta["generated_at"]))
+
+
+@require_safe
+def sitemap_index(request):
+    """``/sitemap.xml``: a sitemap index listing the current generation's files."""
+    base_url = base_url_for(request)
+    meta = current("sitemap", base_url)
+    if meta is None:
+        try:
+            meta = generate("sitemap", base_url, force=True)
+        except FeedBusy:
+            meta = _usable("sitemap", base_url)
+            if meta is None:
+                return _busy()
+    etag = f'"{meta["generation"]}"'
+    response = get_conditional_response(request, etag=etag, last_modified=int(meta["generated_at"]))
+    if response is None:
+        lastmod = datetime.fromtimestamp(meta["generated_at"], dt_timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        entries = "".join(
+            f"<sitemap><loc>{_text(base_url)}/sitemaps/{meta['generation']}/{part}</loc>"
+            f"<lastmod>{lastmod}</lastmod></sitemap>\n"
+            for part in meta["parts"]
+        )
+        response = HttpResponse(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+            f"{entries}</sitemapindex>\n",
+            content_type="application/xml",
+        )
+    response["ETag"] = etag
+    response["Cache-Control"] = "public, max-age=300"
+    return response
+
+
+@require_safe
+def sitemap_part(request, generation, part):
+    """One gzip sitemap file. Generations are immutable, so they can be cached indefinitely."""
+    if not re.fullmatch(r"[0-9]+-[0-9a-f]{8}", generation) or not re.fullmatch(r"sitemap-[0-9]+\.xml\.gz", part):
+        raise Http404("Not found.")
+    path = feeds_dir("sitemap") / generation / part
+    try:
+        stat = path.stat()
+    except OSError:
+        raise Http404("Not found.")
+    return _serve(
+        request, path, "application/xml", f'"{generation}-{part}"', int(stat.st_mtime), immutable=True, encoded=False
+    )
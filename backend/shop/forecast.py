@@ -0,0 +1,158 @@
+"""Restock forecasting.
+
+Order lines are read as plain integers and bucketed by the day their order
+was placed, then NumPy turns them into a recency-weighted sales rate per
+product: each day's sales are weighted ``0.5 ** (age / half_life)`` and
+divided by the total weight of the days the product was on sale. Stock
+divided by that rate gives the days until it sells out.
+
+Everything after the read is vectorised over all products at once. The
+result replaces ``StockForecast`` in one transaction; products with no sales
+in the window and healthy stock get no row, which keeps the table small.
+"""
+
+from datetime import date, datetime, time, timedelta
+from itertools import chain
+
+import numpy as np
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem, Product, StockForecast
+
+
+WRITE_BATCH = 5000
+# Sell-out further away than this gets no date.
+MAX_FORECAST_DAYS = 3650
+
+
+def _order_days(order_model, since):
+    """Order ids (sorted) and the local day ordinal each was placed on."""
+    rows = order_model.objects.filter(created_at__gte=since).order_by("id").values_list("id", "created_at")
+    tz = timezone.get_current_timezone()
+    ids, days = [], []
+    for order_id, created_at in rows.iterator(chunk_size=50_000):
+        ids.append(order_id)
+        # Much cheaper per row than timezone.localdate().
+        days.append(created_at.astimezone(tz).toordinal())
+    return np.array(ids, dtype=np.int64), np.array(days, dtype=np.int64)
+
+
+def _sales(order_model, item_model, since):
+    """(product_id, day ordinal, units) per order line as an (n, 3) int64 array.
+
+    Only integers cross the database boundary; lines are matched to their
+    order's day with a vectorised search instead of a per-row date function.
+    """
+    order_ids, order_days = _order_days(order_model, since)
+    rows = (
+        item_model.objects.filter(order__created_at__gte=since, product_id__isnull=False)
+        .order_by()
+        .values_list("order_id", "product_id", "quantity")
+    )
+    lines = np.fromiter(chain.from_iterable(rows.iterator(chunk_size=50_000)), dtype=np.int64).reshape(-1, 3)
+    position = np.searchsorted(order_ids, lines[:, 0])
+    # An order placed between the two reads has no day; leave it for the next run.
+    found = position < len(order_ids)
+    found[found] = order_ids[position[found]] == lines[found, 0]
+    return np.column_stack([lines[found, 1], order_days[position[found]], lines[found, 2]])
+
+
+def _products():
+    rows = Product.objects.order_by("id").values_list("id", "stock", "created_at")
+    tz = timezone.get_current_timezone()
+    ids, stock, listed = [], [], []
+    for product_id, product_stock, created_at in rows.iterator(chunk_size=50_000):
+        ids.append(product_id)
+        stock.append(product_stock)
+        listed.append(created_at.astimezone(tz).toordinal())
+    return np.array(ids, dtype=np.int64), np.array(stock, dtype=np.int64), np.array(listed, dtype=np.int64)
+
+
+def project(product_ids, stock, listed_on, sales, today, history_days, half_life):
+    """Vectorised forecast.
+
+    ``sales`` is an (n, 3) array of (product_id, day ordinal, units).
+    Returns ``(units_per_day, units_last_30_days, days_until_stockout)``;
+    days is NaN for products that aren't selling.
+    """
+    n = len(product_ids)
+    index = np.searchsorted(product_ids, sales[:, 0])
+    known = (index < n) & (product_ids[np.minimum(index, n - 1)] == sales[:, 0]) if n else np.zeros(len(sales), bool)
+    index, age, units = index[known], np.clip(today - sales[known, 1], 0, None), sales[known, 2].astype(np.float64)
+
+    decay = 0.5 ** (1 / half_life)
+    weighted = np.bincount(index, weights=units * decay ** age, minlength=n)
+    recent = age < 30
+    last_30 = np.bincount(index[recent], weights=units[recent], minlength=n)
+
+    # Normalise by the days each product has been on sale, not the whole window,
+    # so new products aren't diluted by days before they existed.
+    oldest_sale = np.zeros(n, dtype=np.int64)
+    np.maximum.at(oldest_sale, index, age)
+    days_on_sale = np.clip(np.maximum(today - listed_on, oldest_sale) + 1, 1, history_days)
+    total_weight = (1 - decay ** days_on_sale) / (1 - decay)
+    units_per_day = weighted / total_weight
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_left = np.where(units_per_day > 0, stock / units_per_day, np.nan)
+    days_left[stock == 0] = 0
+    return units_per_day, last_30.astype(np.int64), days_left
+
+
+def at_risk(queryset=None, risk_days=None):
+    """Forecasts for products out of stock, low on stock or selling out within ``risk_days``."""
+    risk_days = risk_days if risk_days is not None else getattr(settings, "FORECAST_RISK_DAYS", 14)
+    queryset = queryset if queryset is not None else StockForecast.objects.all()
+    return queryset.filter(
+        Q(days_until_stockout__lte=risk_days) | Q(stock__lte=getattr(settings, "LOW_STOCK_THRESHOLD", 5))
+    )
+
+
+def build(history_days=None, half_life=None):
+    """Recompute every product's forecast. Returns ``(products, newly_at_risk_ids)``."""
+    history_days = history_days or getattr(settings, "FORECAST_HISTORY_DAYS", 730)
+    half_life = half_life or getattr(settings, "FORECAST_HALF_LIFE_DAYS", 28)
+    now = timezone.now()
+    today = timezone.localdate(now)
+    since = timezone.make_aware(datetime.combine(today - timedelta(days=history_days - 1), time.min))
+
+    product_ids, stock, listed_on = _products()
+    products = len(product_ids)
+    sales = np.concatenate([_sales(Order, OrderItem, since), _sales(ArchivedOrder, ArchivedOrderItem, since)])
+    units_per_day, last_30, days_left = project(
+        product_ids, stock, listed_on, sales, today.toordinal(), history_days, half_life
+    )
+
+    keep = (units_per_day > 0) | (stock <= getattr(settings, "LOW_STOCK_THRESHOLD", 5))
+    product_ids, stock, units_per_day, last_30, days_left = (
+        product_ids[keep], stock[keep], units_per_day[keep], last_30[keep], days_left[keep]
+    )
+
+    previously_at_risk = set(at_risk().values_list("product_id", flat=True))
+    with transaction.atomic():
+        StockForecast.objects.all().delete()
+        for start in range(0, len(product_ids), WRITE_BATCH):
+            end = start + WRITE_BATCH
+            StockForecast.objects.bulk_create(
+                StockForecast(
+                    product_id=int(product_id),
+                    stock=int(product_stock),
+                    units_per_day=float(rate),
+                    units_last_30_days=int(recent),
+                    days_until_stockout=None if np.isnan(days) else float(days),
+                    stockout_date=(
+                        date.fromordinal(today.toordinal() + int(days)) if days < MAX_FORECAST_DAYS else None
+                    ),
+                    computed_at=now,
+                )
+                for product_id, product_stock, rate, recent, days in zip(
+                    product_ids[start:end], stock[start:end], units_per_day[start:end],
+                    last_30[start:end], days_left[start:end],
+                )
+            )
+    newly_at_risk = [pid for pid in at_risk().values_list("product_id", flat=True) if pid not in previously_at_risk]
+    return products, newly_at_risk
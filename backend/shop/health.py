@@ -0,0 +1,172 @@
+"""Liveness and readiness probes.
+
+``live()`` only says the process is up and serving requests. ``ready()``
+checks what requests depend on: a database round trip, no unapplied
+migrations, a working cache and writable media storage with free space.
+
+Each check runs in its own thread with a deadline, so a hung dependency
+fails the probe instead of hanging it, and a check that is still stuck from
+an earlier probe isn't started again. The report is cached per process for
+``HEALTH_CACHE_SECONDS`` so frequent load balancer probes don't turn into
+database load.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, connections
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+from django.utils import timezone
+
+from . import singleflight
+
+
+logger = logging.getLogger(__name__)
+
+STARTED_AT = time.monotonic()
+
+# name -> thread still running from an earlier probe that timed out
+_stuck = {}
+_last = None  # (report, fresh_until)
+
+
+class HealthCheckError(Exception):
+    pass
+
+
+def check_database():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+    return {"vendor": connection.vendor}
+
+
+@lru_cache(maxsize=None)
+def expected_migrations():
+    """The latest migration of each app, read from disk once per process."""
+    return frozenset(MigrationLoader(None, ignore_no_migrations=True).graph.leaf_nodes())
+
+
+def check_migrations():
+    applied = MigrationRecorder(connection).applied_migrations()
+    missing = sorted(f"{app}.{name}" for app, name in expected_migrations() if (app, name) not in applied)
+    if missing:
+        raise HealthCheckError(f"Unapplied migrations: {', '.join(missing)}")
+    return {}
+
+
+def check_cache():
+    key = f"health:{uuid.uuid4().hex}"
+    cache.set(key, 1, timeout=30)
+    if cache.get(key) != 1:
+        raise HealthCheckError("Cache did not return the value just written.")
+    cache.delete(key)
+    return {}
+
+
+def check_storage():
+    location = getattr(default_storage, "location", None)
+    if not location:
+        name = default_storage.save(f".health/{uuid.uuid4().hex}", ContentFile(b"ok"))
+        default_storage.delete(name)
+        return {}
+    os.makedirs(location, exist_ok=True)
+    free = shutil.disk_usage(location).free
+    minimum = getattr(settings, "HEALTH_MIN_FREE_BYTES", 0)
+    if free < minimum:
+        raise HealthCheckError(f"{free} bytes free in {location}, need at least {minimum}.")
+    # Straight to disk: saving through the storage would also write a MediaBlob row.
+    with tempfile.NamedTemporaryFile(dir=location, prefix=".health-") as probe:
+        probe.write(b"ok")
+        probe.flush()
+    return {"free_bytes": free}
+
+
+CHECKS = {
+    "database": check_database,
+    "migrations": check_migrations,
+    "cache": check_cache,
+    "storage": check_storage,
+}
+
+
+def _start(check):
+    result = {}
+
+    def target():
+        start = time.perf_counter()
+        try:
+            result.update(status="ok", **check())
+        except Exception as exc:
+            result.update(status="fail", error=f"{type(exc).__name__}: {exc}")
+        finally:
+            result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            connections.close_all()
+
+    thread = threading.Thread(target=target, name="health-check", daemon=True)
+    thread.start()
+    return thread, result
+
+
+def run_checks(timeout=None):
+    """Run every check concurrently, giving up on any still running after ``timeout`` seconds."""
+    timeout = timeout if timeout is not None else getattr(settings, "HEALTH_CHECK_TIMEOUT", 2.0)
+    start = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    started, checks = {}, {}
+    for name, check in CHECKS.items():
+        stuck = _stuck.get(name)
+        if stuck is not None and stuck.is_alive():
+            checks[name] = {"status": "fail", "error": "Previous check has not finished."}
+        else:
+            _stuck.pop(name, None)
+            started[name] = _start(check)
+
+    for name, (thread, result) in started.items():
+        thread.join(max(deadline - time.monotonic(), 0))
+        if thread.is_alive():
+            _stuck[name] = thread
+            checks[name] = {"status": "fail", "error": f"Timed out after {timeout}s."}
+        else:
+            checks[name] = result
+
+    failed = sorted(name for name, result in checks.items() if result["status"] != "ok")
+    if failed:
+        logger.warning("Readiness check failed: %s", {name: checks[name].get("error") for name in failed})
+    return {
+        "status": "fail" if failed else "ok",
+        "checked_at": timezone.now().isoformat(),
+        "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+        "checks": {name: checks[name] for name in CHECKS},
+    }
+
+
+def _refresh():
+    global _last
+    report = run_checks()
+    _last = (report, time.monotonic() + getattr(settings, "HEALTH_CACHE_SECONDS", 5))
+    return report
+
+
+def ready():
+    """The latest readiness report, re-running the checks when it's older than ``HEALTH_CACHE_SECONDS``."""
+    last = _last
+    if last is not None and time.monotonic() < last[1]:
+        return {**last[0], "cached": True}
+    # Concurrent probes share one run.
+    return {**singleflight.do("health:ready", _refresh), "cached": False}
+
+
+def live():
+    return {"status": "ok", "pid": os.getpid(), "uptime_seconds": round(time.monotonic() - STARTED_AT, 1)}
@@ -0,0 +1,163 @@
+"""Product price and stock history.
+
+Every committed change to a product's price or stock appends a
+``ProductChangeLog`` row. Changes made in one transaction (e.g. every line
+of a checkout) are written with a single INSERT once it commits, stamped
+with the commit time. Rows are never updated, so the latest row per product
+at or before a moment is that product's state at that moment.
+"""
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import oncommit
+from .models import Product, ProductChangeLog
+
+
+def _insert(rows):
+    now = timezone.now()
+    for row in rows:
+        row.changed_at = now
+    ProductChangeLog.objects.bulk_create(rows)
+
+
+def _append(row):
+    oncommit.append(_insert, row)
+
+
+def _money(value):
+    return None if value is None else Decimal(str(value)).quantize(Decimal("0.01"))
+
+
+def record(product, created=False, reason=None):
+    """Log ``product``'s price and stock if this save changed them."""
+    previous_stock = None if created else getattr(product, "_loaded_stock", None)
+    previous_price = None if created else _money(getattr(product, "_loaded_price", None))
+    # The API assigns payload values as sent, so stock may still be a string like "5".
+    stock = int(product.stock)
+    price = _money(product.price)
+    if not created and previous_stock == stock and previous_price == price:
+        return
+    product._loaded_price = price
+    _append(
+        ProductChangeLog(
+            product_id=product.id,
+            price=price,
+            stock=stock,
+            stock_delta=stock - (previous_stock or 0),
+            reason=reason or (ProductChangeLog.CREATED if created else ProductChangeLog.UPDATED),
+        )
+    )
+
+
+def record_deleted(product):
+    _append(
+        ProductChangeLog(
+            product_id=product.id,
+            price=_money(product.price),
+            stock=product.stock,
+            reason=ProductChangeLog.DELETED,
+        )
+    )
+
+
+def parse_moment(value, end_of_day=True):
+    """Parse an ISO date or datetime; a bare date means the end of that day (or its start)."""
+    day = parse_date(value)
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1) if end_of_day else day, time.min)
+        if end_of_day:
+            moment -= timedelta(microseconds=1)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(f"Invalid date: {value!r}")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def snapshot(as_of):
+    """The catalog's price and stock as of ``as_of``; products deleted by then are left out.
+
+    One grouped scan over the log up to ``as_of``, then a primary-key fetch
+    of the matching rows.
+    """
+    latest = (
+        ProductChangeLog.objects.filter(changed_at__lte=as_of)
+        .order_by()
+        .values("product_id")
+        .annotate(last_id=Max("id"))
+        .values("last_id")
+    )
+    rows = list(
+        ProductChangeLog.objects.filter(id__in=latest)
+        .exclude(reason=ProductChangeLog.DELETED)
+        .order_by("product_id")
+        .values("product_id", "price", "stock", "changed_at")
+    )
+    names = dict(Product.objects.filter(id__in=[row["product_id"] for row in rows]).values_list("id", "name"))
+    return [
+        {
+            "product_id": row["product_id"],
+            "name": names.get(row["product_id"]),
+            "price": float(row["price"]),
+            "stock": row["stock"],
+            "changed_at": row["changed_at"].isoformat(),
+        }
+        for row in rows
+    ]
+
+
+def product_history(product_id, since=None, until=None, limit=500):
+    """A product's changes, newest first, read from the (product, changed_at) index."""
+    rows = ProductChangeLog.objects.filter(product_id=product_id)
+    if since is not None:
+        rows = rows.filter(changed_at__gte=since)
+    if until is not None:
+        rows = rows.filter(changed_at__lte=until)
+    rows = rows.order_by("-changed_at", "-id").values("price", "stock", "stock_delta", "reason", "changed_at")
+    return [
+        {**row, "price": float(row["price"]), "changed_at": row["changed_at"].isoformat()}
+        for row in rows[:limit]
+    ]
+
+
+def stock_velocity(days=30, now=None):
+    """Units sold and restocked per product over the last ``days``, with days of stock left.
+
+    Sorted so the products that will run out soonest come first.
+    """
+    now = now or timezone.now()
+    since = now - timedelta(days=days)
+    totals = (
+        ProductChangeLog.objects.filter(changed_at__gte=since, changed_at__lte=now)
+        .order_by()
+        .values("product_id")
+        .annotate(
+            sold=Sum("stock_delta", filter=Q(reason=ProductChangeLog.SALE)),
+            restocked=Sum("stock_delta", filter=Q(stock_delta__gt=0) & ~Q(reason=ProductChangeLog.CREATED)),
+        )
+    )
+    totals = {row["product_id"]: row for row in totals}
+    report = []
+    for product_id, name, stock in Product.objects.filter(id__in=totals).values_list("id", "name", "stock"):
+        sold = -(totals[product_id]["sold"] or 0)
+        per_day = sold / days
+        report.append(
+            {
+                "product_id": product_id,
+                "name": name,
+                "stock": stock,
+                "units_sold": sold,
+                "units_restocked": totals[product_id]["restocked"] or 0,
+                "units_per_day": round(per_day, 3),
+                "days_of_stock_left": round(stock / per_day, 1) if per_day else None,
+            }
+        )
+    report.sort(key=lambda row: (row["days_of_stock_left"] is None, row["days_of_stock_left"] or 0))
+    return report
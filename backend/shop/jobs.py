@@ -0,0 +1,206 @@
+"""A small database-backed job queue.
+
+Jobs are rows in ``shop.Job``. Code enqueues them with ``enqueue`` (insert
+now, inside the caller's transaction) or ``enqueue_on_commit`` (insert once
+the caller's transaction commits, batched into a single INSERT). Workers
+started with ``manage.py run_workers`` claim ready rows with
+``SELECT ... FOR UPDATE SKIP LOCKED``, run the registered handler and retry
+failures with exponential backoff. Workers also requeue jobs orphaned by a
+dead worker and enqueue the periodic jobs in ``JOB_SCHEDULE``.
+"""
+
+import logging
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import oncommit
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+def job(name=None):
+    """Register a function as a job handler. It is called with the payload as kwargs."""
+
+    def decorator(func):
+        func.job_name = name or f"{func.__module__}.{func.__name__}"
+        _handlers[func.job_name] = func
+        return func
+
+    return decorator
+
+
+def get_handler(name):
+    return _handlers.get(name)
+
+
+def registered_names():
+    return sorted(_handlers)
+
+
+def _job_name(name_or_func):
+    return getattr(name_or_func, "job_name", name_or_func)
+
+
+def _build(name_or_func, payload=None, delay=0, max_attempts=None):
+    return Job(
+        name=_job_name(name_or_func),
+        payload=payload or {},
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or getattr(settings, "JOB_MAX_ATTEMPTS", 5),
+    )
+
+
+def enqueue(name_or_func, payload=None, delay=0, max_attempts=None) -> Job:
+    """Insert a job right away. Inside ``atomic()`` it commits or rolls back with the caller."""
+    job_obj = _build(name_or_func, payload, delay, max_attempts)
+    job_obj.save()
+    return job_obj
+
+
+def _insert(jobs):
+    Job.objects.bulk_create(jobs)
+
+
+def enqueue_on_commit(name_or_func, payload=None, delay=0, max_attempts=None):
+    """Queue a job once the current transaction commits.
+
+    Jobs queued during one transaction are written with one bulk INSERT, and
+    nothing is written if the transaction rolls back. Outside a transaction
+    the job is inserted immediately.
+    """
+    oncommit.append(_insert, _build(name_or_func, payload, delay, max_attempts))
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{threading.get_native_id()}"
+
+
+def claim(worker_id, batch_size=1):
+    """Lock up to ``batch_size`` ready jobs for ``worker_id`` and return them."""
+    now = timezone.now()
+    ready = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by("run_at")
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            ids = list(ready.select_for_update(skip_locked=True).values_list("id", flat=True)[:batch_size])
+            if not ids:
+                return []
+            claimed = Job.objects.filter(id__in=ids)
+        else:
+            # No SKIP LOCKED (SQLite): claim with a single UPDATE so the write lock is
+            # taken up front, and let the status guard stop double-claims.
+            claimed = Job.objects.filter(id__in=ready.values("id")[:batch_size], status=Job.QUEUED)
+        if not claimed.update(status=Job.RUNNING, locked_by=worker_id, locked_at=now, attempts=F("attempts") + 1):
+            return []
+        return list(Job.objects.filter(status=Job.RUNNING, locked_by=worker_id, locked_at=now))
+
+
+def backoff_seconds(attempts):
+    base = getattr(settings, "JOB_RETRY_BASE_SECONDS", 5)
+    cap = getattr(settings, "JOB_RETRY_MAX_SECONDS", 3600)
+    delay = min(base * 2 ** max(attempts - 1, 0), cap)
+    return delay + random.uniform(0, delay / 4)
+
+
+def run(job_obj) -> bool:
+    """Run a claimed job. Successful jobs are deleted; failures are retried or marked failed."""
+    handler = get_handler(job_obj.name)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job {job_obj.name!r}.")
+        handler(**job_obj.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job %s (%s) failed on attempt %s", job_obj.id, job_obj.name, job_obj.attempts)
+        if job_obj.attempts >= job_obj.max_attempts:
+            Job.objects.filter(id=job_obj.id).update(status=Job.FAILED, last_error=error, locked_by="")
+        else:
+            Job.objects.filter(id=job_obj.id).update(
+                status=Job.QUEUED,
+                run_at=timezone.now() + timedelta(seconds=backoff_seconds(job_obj.attempts)),
+                last_error=error,
+                locked_by="",
+                locked_at=None,
+            )
+        return False
+    Job.objects.filter(id=job_obj.id).delete()
+    return True
+
+
+def requeue_stale():
+    """Put back jobs whose worker died while holding them."""
+    timeout = getattr(settings, "JOB_LOCK_TIMEOUT_SECONDS", 600)
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff).update(
+        status=Job.QUEUED, locked_by="", locked_at=None
+    )
+
+
+def schedule_periodic():
+    """Enqueue each ``JOB_SCHEDULE`` job that has no queued or running copy, to run after its interval.
+
+    Two workers checking at the same moment can both enqueue one; the
+    scheduled jobs are safe to run twice.
+    """
+    scheduled = 0
+    for name, interval in getattr(settings, "JOB_SCHEDULE", {}).items():
+        if not Job.objects.filter(name=name, status__in=[Job.QUEUED, Job.RUNNING]).exists():
+            enqueue(name, delay=interval)
+            scheduled += 1
+    return scheduled
+
+
+def housekeeping():
+    requeue_stale()
+    schedule_periodic()
+
+
+def work(worker_id=None, batch_size=10, poll_interval=1.0, stop_event=None, burst=False):
+    """Claim and run jobs until ``stop_event`` is set (or the queue is empty when ``burst``)."""
+    worker_id = worker_id or default_worker_id()
+    stop_event = stop_event or threading.Event()
+    processed = 0
+    interval = getattr(settings, "JOB_HOUSEKEEPING_SECONDS", 60)
+    # Spread the workers' housekeeping out rather than running it all at once.
+    next_housekeeping = time.monotonic() + random.uniform(0, interval)
+    try:
+        while not stop_event.is_set():
+            try:
+                if time.monotonic() >= next_housekeeping:
+                    housekeeping()
+                    next_housekeeping = time.monotonic() + interval
+                jobs = claim(worker_id, batch_size)
+            except DatabaseError:
+                logger.exception("Worker %s could not reach the job table; retrying", worker_id)
+                connection.close()
+                stop_event.wait(poll_interval)
+                continue
+            if not jobs:
+                if burst:
+                    break
+                stop_event.wait(poll_interval)
+                continue
+            for index, job_obj in enumerate(jobs):
+                if stop_event.is_set():
+                    # Hand unstarted jobs back instead of waiting for the stale-lock timeout.
+                    Job.objects.filter(id__in=[j.id for j in jobs[index:]]).update(
+                        status=Job.QUEUED, locked_by="", locked_at=None, attempts=F("attempts") - 1
+                    )
+                    break
+                run(job_obj)
+                processed += 1
+    finally:
+        connection.close()
+    return processed
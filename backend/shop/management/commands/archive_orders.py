@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from shop import archive
+
+
+class Command(BaseCommand):
+    help = "Move delivered orders older than N days into the archive tables, in resumable batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=getattr(settings, "ORDER_ARCHIVE_AFTER_DAYS", 365),
+            help="Archive delivered orders created more than this many days ago.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000, help="Orders moved per transaction.")
+        parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches.")
+        parser.add_argument("--sleep", type=float, default=0.0, help="Pause between batches to limit load.")
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many orders would move.")
+
+    def handle(self, *args, **options):
+        days = options["days"]
+        if options["dry_run"]:
+            count = archive.archivable_orders(days).count()
+            self.stdout.write(f"{count} delivered order(s) older than {days} days would be archived.")
+            return
+
+        total = 0
+        batches = 0
+        while options["max_batches"] is None or batches < options["max_batches"]:
+            moved = archive.archive_batch(days, options["batch_size"])
+            if not moved:
+                break
+            total += moved
+            batches += 1
+            self.stdout.write(f"Batch {batches}: archived {moved} order(s) ({total} total).")
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} order(s) in {batches} batch(es)."))
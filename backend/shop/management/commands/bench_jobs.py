@@ -0,0 +1,73 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from shop import jobs
+from shop.models import Job
+
+
+BENCH_JOB = "shop.bench_noop"
+
+
+@jobs.job(BENCH_JOB)
+def bench_noop(**payload):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Measure job queue enqueue and dequeue throughput against the configured database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--jobs", type=int, default=2000, help="Jobs per phase.")
+        parser.add_argument("--concurrency", type=int, default=4, help="Worker threads for the concurrent phase.")
+        parser.add_argument("--batch-size", type=int, default=10, help="Jobs claimed per query.")
+
+    def report(self, label, count, seconds):
+        rate = count / seconds if seconds else float("inf")
+        self.stdout.write(f"{label:<36} {count:>7} jobs  {seconds:8.3f}s  {rate:10.0f} jobs/s")
+
+    def pending(self):
+        return Job.objects.filter(name=BENCH_JOB, status=Job.QUEUED).count()
+
+    def enqueue_batched(self, count):
+        with transaction.atomic():
+            for index in range(count):
+                jobs.enqueue_on_commit(BENCH_JOB, {"n": index})
+
+    def drain(self, workers, batch_size):
+        threads = [
+            threading.Thread(target=jobs.work, kwargs={"batch_size": batch_size, "burst": True})
+            for _ in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def handle(self, *args, **options):
+        count = options["jobs"]
+        workers = options["concurrency"]
+        batch_size = options["batch_size"]
+        Job.objects.filter(name=BENCH_JOB).delete()
+
+        start = time.perf_counter()
+        for index in range(count):
+            jobs.enqueue(BENCH_JOB, {"n": index})
+        self.report("enqueue (one INSERT per job)", count, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        self.drain(1, 1)
+        self.report("dequeue (1 worker, batch 1)", count - self.pending(), time.perf_counter() - start)
+
+        start = time.perf_counter()
+        self.enqueue_batched(count)
+        self.report("enqueue_on_commit (one bulk INSERT)", count, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        self.drain(workers, batch_size)
+        label = f"dequeue ({workers} workers, batch {batch_size})"
+        self.report(label, count - self.pending(), time.perf_counter() - start)
+
+        Job.objects.filter(name=BENCH_JOB).delete()
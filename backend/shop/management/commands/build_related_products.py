@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop import recommendations
+
+
+class Command(BaseCommand):
+    help = "Build the \"frequently bought together\" table from order history (incremental by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Rebuild from all order lines, including archived.")
+        parser.add_argument("--top-k", type=int, default=None, help="Related products kept per product.")
+        parser.add_argument(
+            "--min-co-purchases",
+            type=int,
+            default=None,
+            help="Ignore pairs bought together fewer times than this.",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        lines, links = recommendations.build(
+            k=options["top_k"],
+            full=options["full"],
+            min_co_purchases=options["min_co_purchases"],
+        )
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"Read {lines} order line(s), wrote {links} link(s) in {elapsed:.2f}s."))
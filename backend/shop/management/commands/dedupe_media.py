@@ -0,0 +1,52 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from shop import media
+from shop.models import MediaBlob
+
+
+class Command(BaseCommand):
+    help = (
+        "Move existing media into content-addressed storage, merging duplicate files, "
+        "then recount references and remove files nothing uses."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--orphan-age",
+            type=int,
+            default=3600,
+            help="Only remove unreferenced files and abandoned uploads older than this many seconds.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be moved.")
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        if not isinstance(storage, media.ContentAddressedStorage):
+            raise CommandError("The default storage is not shop.media.ContentAddressedStorage.")
+
+        tracked = set(MediaBlob.objects.values_list("name", flat=True))
+        untracked = sorted(name for name in media.referenced_names() if name not in tracked and not media.digest_of(name))
+        if options["dry_run"]:
+            self.stdout.write(f"{len(untracked)} file(s) would be moved into content-addressed storage:")
+            for name in untracked:
+                self.stdout.write(f"  {name}")
+            return
+
+        before = media.disk_usage(storage)
+        adopted = {}
+        for name in untracked:
+            new_name = media.adopt(storage, name)
+            if new_name is None:
+                self.stderr.write(f"Missing file, left as is: {name}")
+                continue
+            adopted[name] = new_name
+        updated, collected = media.recount(storage)
+        pruned = media.prune_orphans(storage, options["orphan_age"])
+        after = media.disk_usage(storage)
+
+        self.stdout.write(
+            f"Moved {len(adopted)} file(s) into {len(set(adopted.values()))} content-addressed file(s); "
+            f"fixed {updated} reference count(s), removed {collected} unreferenced and {len(pruned)} orphaned file(s)."
+        )
+        self.stdout.write(self.style.SUCCESS(f"Media size: {before} -> {after} bytes ({before - after} reclaimed)."))
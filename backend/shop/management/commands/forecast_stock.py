@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop import forecast
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute per-product sales velocity and days until stockout now. Workers also run this "
+        "every FORECAST_INTERVAL_SECONDS as the shop.forecast_stock job."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--history-days", type=int, default=None, help="Days of order history to read.")
+        parser.add_argument("--half-life", type=float, default=None, help="Half-life in days of the sales weighting.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        products, newly_at_risk = forecast.build(options["history_days"], options["half_life"])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Forecast {products} product(s) in {elapsed:.2f}s; {len(newly_at_risk)} newly at risk."
+            )
+        )
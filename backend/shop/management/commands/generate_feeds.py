@@ -0,0 +1,51 @@
+import resource
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shop import feeds
+
+
+class Command(BaseCommand):
+    help = "Generate the product feeds and sitemap on disk, skipping any that are already current."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "kinds", nargs="*", help=f"Feeds to generate: {', '.join(sorted(feeds.KINDS))} (default: all)."
+        )
+        parser.add_argument(
+            "--base-url",
+            default=getattr(settings, "FEED_BASE_URL", ""),
+            help="Public origin used in links, e.g. https://shop.example.com (default: FEED_BASE_URL).",
+        )
+        parser.add_argument("--force", action="store_true", help="Regenerate even if the catalog hasn't changed.")
+
+    def handle(self, *args, **options):
+        base_url = options["base_url"].rstrip("/")
+        if not base_url:
+            raise CommandError("Pass --base-url or set FEED_BASE_URL.")
+        unknown = set(options["kinds"]) - set(feeds.KINDS)
+        if unknown:
+            raise CommandError(f"Unknown feed(s): {', '.join(sorted(unknown))}.")
+
+        for kind in options["kinds"] or sorted(feeds.KINDS):
+            start = time.perf_counter()
+            previous = feeds.read_meta(kind)
+            try:
+                meta = feeds.generate(kind, base_url, force=options["force"])
+            except feeds.FeedBusy as exc:
+                self.stderr.write(str(exc))
+                continue
+            if previous is not None and meta["generation"] == previous["generation"]:
+                self.stdout.write(f"{kind}: up to date ({meta['products']} products).")
+                continue
+            directory = feeds.feeds_dir(kind) / meta["generation"]
+            size = sum((directory / part).stat().st_size for part in meta["parts"])
+            self.stdout.write(
+                f"{kind}: {meta['products']} products in {len(meta['parts'])} file(s), "
+                f"{size / 1024:.0f} KiB gzipped, {time.perf_counter() - start:.1f}s."
+            )
+        # ru_maxrss is in KiB on Linux.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.stdout.write(self.style.SUCCESS(f"Done. Peak memory: {peak / 1024:.0f} MiB."))
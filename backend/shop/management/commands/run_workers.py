@@ -0,0 +1,96 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from shop import jobs
+
+
+def _process_main(batch_size, poll_interval, burst):
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    jobs.work(batch_size=batch_size, poll_interval=poll_interval, stop_event=stop_event, burst=burst)
+
+
+class Command(BaseCommand):
+    help = "Run background job workers for the shop job queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=2, help="Number of workers to run.")
+        parser.add_argument(
+            "--processes",
+            action="store_true",
+            help="Run each worker in its own process instead of a thread (for CPU-heavy jobs).",
+        )
+        parser.add_argument("--batch-size", type=int, default=10, help="Jobs claimed per query.")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to sleep when idle.")
+        parser.add_argument("--burst", action="store_true", help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        concurrency = max(options["concurrency"], 1)
+        batch_size = options["batch_size"]
+        poll_interval = options["poll_interval"]
+        burst = options["burst"]
+
+        requeued = jobs.requeue_stale()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s).")
+        # Workers keep doing both every JOB_HOUSEKEEPING_SECONDS.
+        scheduled = jobs.schedule_periodic()
+        if scheduled:
+            self.stdout.write(f"Scheduled {scheduled} periodic job(s).")
+
+        if options["processes"]:
+            self._run_processes(concurrency, batch_size, poll_interval, burst)
+        else:
+            self._run_threads(concurrency, batch_size, poll_interval, burst)
+
+    def _run_threads(self, concurrency, batch_size, poll_interval, burst):
+        stop_event = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+        signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    jobs.work(batch_size=batch_size, poll_interval=poll_interval, stop_event=stop_event, burst=burst)
+                ),
+                name=f"shop-worker-{index}",
+                daemon=True,
+            )
+            for index in range(concurrency)
+        ]
+        self.stdout.write(f"Starting {concurrency} worker thread(s).")
+        for thread in threads:
+            thread.start()
+        # Join with a timeout so the main thread keeps handling signals.
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=0.5)
+        self.stdout.write(self.style.SUCCESS(f"Workers stopped after {sum(results)} job(s)."))
+
+    def _run_processes(self, concurrency, batch_size, poll_interval, burst):
+        # Children must open their own database connections.
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=_process_main, args=(batch_size, poll_interval, burst), name=f"shop-worker-{index}")
+            for index in range(concurrency)
+        ]
+        self.stdout.write(f"Starting {concurrency} worker process(es).")
+        for process in processes:
+            process.start()
+
+        def forward(signum, frame):
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, forward)
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
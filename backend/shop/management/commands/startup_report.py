@@ -0,0 +1,88 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Runs in a fresh interpreter so every import is cold, like a new worker.
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+timings = {{"load_app": time.perf_counter() - start}}
+from shop import warmup
+timings.update(("preload." + step, seconds) for step, seconds in warmup.preload().items())
+if {warm_caches}:
+    timings.update(("worker." + step, seconds) for step, seconds in warmup.warm_worker().items())
+timings["total"] = time.perf_counter() - start
+sys.stdout.write(json.dumps(timings))
+"""
+
+
+def parse_importtime(lines):
+    """Parse ``-X importtime`` output into ``[(module, self_us, cumulative_us)]``."""
+    modules = []
+    for line in lines:
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+class Command(BaseCommand):
+    help = "Measure how long a cold worker takes to import and warm up the app, per module."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--app", choices=["wsgi", "asgi"], default="wsgi", help="Entry point to import.")
+        parser.add_argument("--limit", type=int, default=25, help="How many modules/packages to list.")
+        parser.add_argument(
+            "--sort",
+            choices=["cumulative", "self"],
+            default="cumulative",
+            help="Rank modules by time including (cumulative) or excluding (self) their own imports.",
+        )
+        parser.add_argument(
+            "--warm-caches", action="store_true", help="Also time the per-worker cache warmup (needs the database)."
+        )
+
+    def handle(self, *args, **options):
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "backend.settings"),
+            "PYTHONPATH": os.pathsep.join(filter(None, [str(settings.BASE_DIR), os.environ.get("PYTHONPATH")])),
+        }
+        probe = PROBE.format(module=f"backend.{options['app']}", warm_caches=options["warm_caches"])
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", probe],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"Startup probe failed:\n{result.stderr[-2000:]}")
+
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        modules = parse_importtime(result.stderr.splitlines())
+
+        self.stdout.write("Startup phases:")
+        for phase, seconds in timings.items():
+            self.stdout.write(f"  {phase:<24} {seconds * 1000:9.1f} ms")
+
+        packages = defaultdict(int)
+        for name, self_us, _ in modules:
+            packages[name.split(".")[0]] += self_us
+        self.stdout.write(f"\nImport time by top-level package ({len(modules)} modules imported):")
+        for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:options["limit"]]:
+            self.stdout.write(f"  {package:<40} {self_us / 1000:9.1f} ms")
+
+        column = 2 if options["sort"] == "cumulative" else 1
+        self.stdout.write(f"\nSlowest modules ({options['sort']}):")
+        self.stdout.write(f"  {'module':<56} {'self ms':>9} {'cumul. ms':>10}")
+        for name, self_us, cumulative_us in sorted(modules, key=lambda row: -row[column])[:options["limit"]]:
+            self.stdout.write(f"  {name:<56} {self_us / 1000:9.1f} {cumulative_us / 1000:10.1f}")
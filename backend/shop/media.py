@@ -0,0 +1,343 @@
+"""Content-addressed media storage and serving.
+
+``ContentAddressedStorage`` hashes each upload (SHA-256) while streaming it
+to a temporary file, then stores it under its digest, e.g.
+``products/3f/3fa1...c9.jpg``. Uploading the same bytes again reuses the
+stored file. ``MediaBlob`` counts the references to each file: ``save()``
+adds one, ``delete()`` removes one, and the file is only unlinked once
+nothing refers to it. The blob row doubles as the lock that keeps a delete
+from racing a save of the same content.
+
+``serve`` sends media files with ``FileResponse``, so servers that provide
+``wsgi.file_wrapper`` (gunicorn) use sendfile, and supports ETags,
+conditional requests and single byte ranges.
+"""
+
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+
+from django.apps import apps
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FileField
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .models import MediaBlob
+
+
+CHUNK_SIZE = 64 * 1024
+INCOMING_DIR = ".incoming"
+DIGEST_NAME_RE = re.compile(r"(?:^|/)[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})(?:\.[0-9a-z]{1,10})?$")
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# Content-addressed files never change, so clients may keep them forever.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def digest_of(name):
+    """The SHA-256 hex digest a content-addressed name was stored under, or None."""
+    match = DIGEST_NAME_RE.search(name)
+    return match["digest"] if match else None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage that keeps one reference-counted copy of each distinct file."""
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content, so the requested one never clashes.
+        return name
+
+    def _receive(self, content):
+        """Stream ``content`` into a temporary file, returning ``(temp path, sha256 hex, size)``."""
+        incoming = os.path.join(self.location, INCOMING_DIR)
+        os.makedirs(incoming, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=incoming, delete=False) as temp:
+            try:
+                if hasattr(content, "seek"):
+                    content.seek(0)
+                for chunk in content.chunks(CHUNK_SIZE):
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    temp.write(chunk)
+                    size += len(chunk)
+            except BaseException:
+                temp.close()
+                os.unlink(temp.name)
+                raise
+        return temp.name, digest.hexdigest(), size
+
+    def _save(self, name, content):
+        temp_path, digest, size = self._receive(content)
+        directory, requested = os.path.split(name)
+        extension = os.path.splitext(requested)[1].lower()
+        if not re.fullmatch(r"\.[0-9a-z]{1,10}", extension):
+            extension = ""
+        name = "/".join(filter(None, [directory, digest[:2], f"{digest}{extension}"]))
+        path = self.path(name)
+        try:
+            with transaction.atomic():
+                # Take the reference first: the row lock keeps a concurrent delete
+                # from unlinking the file between the check below and our commit.
+                if not MediaBlob.objects.filter(name=name).update(references=F("references") + 1):
+                    try:
+                        with transaction.atomic():
+                            MediaBlob.objects.create(name=name, size=size, references=1)
+                    except IntegrityError:
+                        MediaBlob.objects.filter(name=name).update(references=F("references") + 1)
+                if os.path.exists(path):
+                    os.unlink(temp_path)
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(temp_path, self.file_permissions_mode)
+                    os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return name
+
+    def delete(self, name):
+        """Drop one reference to ``name``; the file goes once the last one is released."""
+        if not name:
+            raise ValueError("The name must be given to delete().")
+        blobs = MediaBlob.objects.filter(name=name)
+        with transaction.atomic():
+            blobs.filter(references__gt=0).update(references=F("references") - 1)
+            references = blobs.values_list("references", flat=True).first()
+        if references is None:
+            # Not tracked (e.g. stored before this backend): a plain file.
+            super().delete(name)
+        elif references == 0:
+            transaction.on_commit(lambda: self.collect(name))
+
+    def collect(self, name):
+        """Unlink ``name`` if nothing references it any more."""
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name, references=0).first()
+            if blob is None:
+                return False
+            super().delete(name)
+            blob.delete()
+        return True
+
+
+def file_fields():
+    """``(model, field)`` for every file field kept in a content-addressed storage."""
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage):
+                yield model, field
+
+
+def referenced_names():
+    """How many rows refer to each stored file name."""
+    counts = Counter()
+    for model, field in file_fields():
+        rows = (
+            model._default_manager.exclude(**{f"{field.name}__isnull": True})
+            .exclude(**{field.name: ""})
+            .order_by()
+            .values_list(field.name)
+            .annotate(rows=Count("pk"))
+        )
+        counts.update(dict(rows))
+    return counts
+
+
+def adopt(storage, name):
+    """Store an untracked file by content, repoint every row at it and remove the original.
+
+    Returns the new name, or None when the file is missing.
+    """
+    if not storage.exists(name):
+        return None
+    with storage.open(name) as file:
+        new_name = storage.save(name, file)
+    for model, field in file_fields():
+        model._default_manager.filter(**{field.name: name}).update(**{field.name: new_name})
+    FileSystemStorage.delete(storage, name)
+    return new_name
+
+
+def recount(storage):
+    """Set every blob's reference count from the rows that use it and collect the unused ones.
+
+    Blob rows are locked before counting, so saves that already took a
+    reference finish first and are counted. Returns ``(updated, collected)``.
+    """
+    updated = collected = 0
+    with transaction.atomic():
+        blobs = dict(MediaBlob.objects.select_for_update().values_list("name", "references"))
+        counts = referenced_names()
+        for name, references in counts.items():
+            if name not in blobs and digest_of(name) and storage.exists(name):
+                # Stored, but its blob row was lost with a rolled-back transaction.
+                MediaBlob.objects.create(name=name, size=storage.size(name), references=references)
+                updated += 1
+        for name, references in blobs.items():
+            if counts.get(name, 0) == references:
+                continue
+            MediaBlob.objects.filter(name=name).update(references=counts.get(name, 0))
+            updated += 1
+        for name in MediaBlob.objects.filter(references=0).values_list("name", flat=True):
+            if storage.exists(name):
+                FileSystemStorage.delete(storage, name)
+            MediaBlob.objects.filter(name=name).delete()
+            collected += 1
+    return updated, collected
+
+
+def prune_orphans(storage, older_than=3600):
+    """Remove stored files no blob row knows about, and abandoned uploads.
+
+    Only files untouched for ``older_than`` seconds, so saves in flight are
+    left alone. Returns the names removed.
+    """
+    cutoff = time.time() - older_than
+    known = set(MediaBlob.objects.values_list("name", flat=True))
+    removed = []
+    for root, dirs, files in os.walk(storage.location):
+        relative = os.path.relpath(root, storage.location).replace(os.sep, "/")
+        relative = "" if relative == "." else relative
+        incoming = relative == INCOMING_DIR
+        dirs[:] = [d for d in dirs if not d.startswith(".") or (not relative and d == INCOMING_DIR)]
+        for file_name in files:
+            name = f"{relative}/{file_name}" if relative else file_name
+            if not (incoming or (digest_of(name) and name not in known)):
+                continue
+            if os.path.getmtime(os.path.join(root, file_name)) < cutoff:
+                os.unlink(os.path.join(root, file_name))
+                removed.append(name)
+    return removed
+
+
+def disk_usage(storage):
+    """Total bytes of the files under ``storage.location``."""
+    total = 0
+    for root, dirs, files in os.walk(storage.location):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def _etag(name, stat):
+    digest = digest_of(name)
+    return f'"{digest}"' if digest else f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """``(start, end)`` (inclusive) for a single byte range, or None to send the whole file.
+
+    Raises ValueError when the range can't be satisfied. Multiple ranges
+    aren't supported and get the whole file, as RFC 9110 allows.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.groups() == ("", "") or size == 0:
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes.
+        if int(last) == 0:
+            raise ValueError(header)
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None  # Invalid, so ignored.
+    if start >= size:
+        raise ValueError(header)
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+class FileRange:
+    """``length`` bytes of an open file from its current position.
+
+    Keeps ``fileno()`` so a sendfile-capable ``wsgi.file_wrapper`` can still
+    send the range without copying it through Python.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+@require_safe
+def serve(request, path):
+    """Serve a file from media storage with ETag, conditional and Range support."""
+    if any(part.startswith(".") for part in path.split("/")):
+        raise Http404("Not found.")
+    try:
+        full_path = default_storage.path(path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, NotImplementedError, OSError):
+        raise Http404("Not found.")
+    if not os.path.isfile(full_path):
+        raise Http404("Not found.")
+
+    etag = _etag(path, stat)
+    last_modified = int(stat.st_mtime)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(last_modified),
+        "Accept-Ranges": "bytes",
+    }
+    if digest_of(path):
+        headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        for header, value in headers.items():
+            response.headers.setdefault(header, value)
+        return response
+
+    size = stat.st_size
+    byte_range = None
+    if_range = request.headers.get("If-Range")
+    if "Range" in request.headers and (if_range is None or if_range in (etag, headers["Last-Modified"])):
+        try:
+            byte_range = parse_range(request.headers["Range"], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or "application/octet-stream"
+    file = open(full_path, "rb")
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(FileRange(file, end - start + 1), status=206, content_type=content_type)
+        response["Content-Length"] = end - start + 1
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    if encoding:
+        response["Content-Encoding"] = encoding
+    for header, value in headers.items():
+        response[header] = value
+    return response
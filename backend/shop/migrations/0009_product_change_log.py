@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_baseline(apps, schema_editor):
+    """Start each existing product's history with its current price and stock."""
+    Product = apps.get_model("shop", "Product")
+    ProductChangeLog = apps.get_model("shop", "ProductChangeLog")
+    rows = (
+        ProductChangeLog(
+            product_id=product.id,
+            price=product.price,
+            stock=product.stock,
+            stock_delta=0,
+            reason="updated",
+            changed_at=product.updated_at,
+        )
+        for product in Product.objects.order_by("id").iterator()
+    )
+    ProductChangeLog.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0008_order_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('stock', models.PositiveIntegerField()),
+                ('stock_delta', models.IntegerField(default=0)),
+                ('reason', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('sale', 'Sale'), ('deleted', 'Deleted')], max_length=10)),
+                ('changed_at', models.DateTimeField()),
+                ('product', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='change_log', to='shop.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'changed_at'], name='shop_pcl_product_changed_idx'), models.Index(fields=['changed_at'], name='shop_pcl_changed_idx')],
+            },
+        ),
+        migrations.RunPython(seed_baseline, migrations.RunPython.noop),
+    ]
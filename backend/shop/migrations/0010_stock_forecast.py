@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_product_change_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockForecast',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='forecast', serialize=False, to='shop.product')),
+                ('stock', models.PositiveIntegerField()),
+                ('units_per_day', models.FloatField()),
+                ('units_last_30_days', models.PositiveIntegerField()),
+                ('days_until_stockout', models.FloatField(null=True)),
+                ('stockout_date', models.DateField(null=True)),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['days_until_stockout'], name='shop_forecast_days_left_idx')],
+            },
+        ),
+    ]
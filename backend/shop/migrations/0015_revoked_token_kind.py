@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0014_revoked_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='revokedtoken',
+            name='kind',
+            # Existing rows are treated as access tokens, so they stay rejected until they expire.
+            field=models.CharField(choices=[('access', 'Access'), ('refresh', 'Refresh')], default='access', max_length=10),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='revokedtoken',
+            index=models.Index(fields=['kind', 'expires_at'], name='shop_revoked_kind_exp_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0015_revoked_token_kind'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='revokedtoken',
+            name='kind',
+            field=models.CharField(choices=[('access', 'Access'), ('refresh', 'Refresh'), ('ticket', 'Stream ticket')], max_length=10),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.hashers import make_password, check_password
+from django.utils import timezone
 import uuid
 
 
@@ -56,9 +57,24 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Latest change, for deciding whether feeds and sitemaps need rebuilding.
+            models.Index(fields=["updated_at"], name="shop_product_updated_idx"),
+        ]
+
     def __str__(self) -> str:
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded stock and price so saves can tell whether they changed.
+        instance._loaded_stock = instance.__dict__.get("stock")
+        instance._loaded_price = instance.__dict__.get("price")
+        instance._loaded_image = instance.__dict__.get("image")
+        return instance
+
 
 class Order(models.Model):
     """Customer orders created at checkout."""
@@ -72,15 +88,35 @@ class Order(models.Model):
 
     # A human friendly immutable ID for customers/admins.
     public_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    # Set when the customer was logged in at checkout.
+    user = models.ForeignKey(User, related_name="orders", on_delete=models.SET_NULL, null=True, blank=True)
     customer_name = models.CharField(max_length=255)
     customer_email = models.EmailField()
     status = models.CharField(max_length=50, choices=ORDER_STATUS_CHOICES, default="Order Placed")
     estimated_delivery = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Lets archive_orders find old delivered orders without a table scan.
+            models.Index(fields=["status", "created_at"], name="shop_order_status_created_idx"),
+            # Order history, newest first.
+            models.Index(fields=["user", "created_at"], name="shop_order_user_created_idx"),
+            models.Index(fields=["customer_email", "created_at"], name="shop_order_email_created_idx"),
+            # Date-range analytics.
+            models.Index(fields=["created_at"], name="shop_order_created_idx"),
+        ]
+
     def __str__(self) -> str:
         return f"Order {self.public_id}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded status so saves can tell whether it changed.
+        instance._loaded_status = instance.__dict__.get("status")
+        return instance
+
     @property
     def total_amount(self) -> float:
         return sum(item.subtotal for item in self.items.all())
@@ -104,3 +140,219 @@ class OrderItem(models.Model):
 
     def __str__(self) -> str:
         return f"{self.product_name} x {self.quantity}"
+
+
+class Job(models.Model):
+    """Background work picked up by ``manage.py run_workers``."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (FAILED, "Failed"),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=255, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Workers only ever scan ready jobs; keep that index tiny.
+            models.Index(fields=["run_at"], condition=models.Q(status="queued"), name="shop_job_ready_idx"),
+            models.Index(fields=["status", "locked_at"], name="shop_job_status_locked_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.status})"
+
+
+class ArchivedOrder(models.Model):
+    """Cold copy of a delivered order moved out of ``Order`` by ``manage.py archive_orders``.
+
+    Keeps the original primary key so archiving is idempotent and resumable.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    public_id = models.UUIDField(unique=True)
+    user = models.ForeignKey(User, related_name="archived_orders", on_delete=models.SET_NULL, null=True, blank=True)
+    customer_name = models.CharField(max_length=255)
+    customer_email = models.EmailField()
+    status = models.CharField(max_length=50, choices=Order.ORDER_STATUS_CHOICES)
+    estimated_delivery = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "created_at"], name="shop_arch_user_created_idx"),
+            models.Index(fields=["customer_email", "created_at"], name="shop_arch_email_created_idx"),
+            models.Index(fields=["created_at"], name="shop_arch_created_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Archived order {self.public_id}"
+
+    @property
+    def total_amount(self) -> float:
+        return sum(item.subtotal for item in self.items.all())
+
+
+class ArchivedOrderItem(models.Model):
+    """Line items of an ``ArchivedOrder``, keeping their original ids."""
+
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, related_name="items", on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    product_name = models.CharField(max_length=255)
+    quantity = models.PositiveIntegerField(default=1)
+    price_per_unit = models.DecimalField(max_digits=10, decimal_places=2)
+
+    @property
+    def subtotal(self) -> float:
+        return float(self.price_per_unit) * self.quantity
+
+    def __str__(self) -> str:
+        return f"{self.product_name} x {self.quantity}"
+
+
+class Event(models.Model):
+    """Change feed behind the live event stream; the id doubles as the SSE event id."""
+
+    ORDER_CREATED = "order.created"
+    ORDER_STATUS_CHANGED = "order.status_changed"
+    STOCK_CHANGED = "stock.changed"
+
+    kind = models.CharField(max_length=50)
+    # Set for order events so a customer can follow a single order.
+    order_public_id = models.UUIDField(null=True, blank=True, db_index=True)
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self) -> str:
+        return f"{self.kind} #{self.id}"
+
+
+class RelatedProduct(models.Model):
+    """Precomputed "frequently bought together" links, built by ``manage.py build_related_products``."""
+
+    product = models.ForeignKey(Product, related_name="related_links", on_delete=models.CASCADE)
+    related = models.ForeignKey(Product, related_name="+", on_delete=models.CASCADE)
+    rank = models.PositiveSmallIntegerField()
+    # Cosine similarity of the two products' order sets.
+    score = models.FloatField()
+    co_purchases = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            # Also the index the related-products endpoint reads from.
+            models.UniqueConstraint(fields=["product", "rank"], name="shop_related_product_rank_uniq"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.product_id} -> {self.related_id} (#{self.rank})"
+
+
+class StockForecast(models.Model):
+    """Projected sell-out per product, rebuilt by the ``shop.forecast_stock`` job."""
+
+    product = models.OneToOneField(Product, primary_key=True, related_name="forecast", on_delete=models.CASCADE)
+    stock = models.PositiveIntegerField()
+    # Recency-weighted average of units sold per day.
+    units_per_day = models.FloatField()
+    units_last_30_days = models.PositiveIntegerField()
+    # Null when the product isn't selling; 0 when it is already out of stock.
+    days_until_stockout = models.FloatField(null=True)
+    stockout_date = models.DateField(null=True)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["days_until_stockout"], name="shop_forecast_days_left_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.product_id}: {self.days_until_stockout} day(s) left"
+
+
+class ProductChangeLog(models.Model):
+    """Append-only history of product price and stock, one row per committed change."""
+
+    CREATED = "created"
+    UPDATED = "updated"
+    SALE = "sale"
+    DELETED = "deleted"
+    REASON_CHOICES = [
+        (CREATED, "Created"),
+        (UPDATED, "Updated"),
+        (SALE, "Sale"),
+        (DELETED, "Deleted"),
+    ]
+
+    # No FK constraint: the history outlives deleted products.
+    product = models.ForeignKey(
+        Product, related_name="change_log", on_delete=models.DO_NOTHING, db_constraint=False
+    )
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    stock = models.PositiveIntegerField()
+    stock_delta = models.IntegerField(default=0)
+    reason = models.CharField(max_length=10, choices=REASON_CHOICES)
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["product", "changed_at"], name="shop_pcl_product_changed_idx"),
+            # Catalog-wide windows (snapshots, velocity) scan by time only.
+            models.Index(fields=["changed_at"], name="shop_pcl_changed_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.product_id} {self.reason} @ {self.changed_at:%Y-%m-%d %H:%M}"
+
+
+class MediaBlob(models.Model):
+    """A stored media file and how many field values refer to it (see shop/media.py)."""
+
+    name = models.CharField(max_length=255, primary_key=True)
+    size = models.PositiveBigIntegerField()
+    references = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.references} refs)"
+
+
+class RevokedToken(models.Model):
+    """An access, refresh or stream ticket token that was revoked or used before it expired (see shop/auth.py)."""
+
+    ACCESS = "access"
+    REFRESH = "refresh"
+    TICKET = "ticket"
+    KIND_CHOICES = [
+        (ACCESS, "Access"),
+        (REFRESH, "Refresh"),
+        (TICKET, "Stream ticket"),
+    ]
+
+    jti = models.CharField(max_length=32, primary_key=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Every process reloads the unexpired revoked access tokens.
+            models.Index(fields=["kind", "expires_at"], name="shop_revoked_kind_exp_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.jti} (expires {self.expires_at:%Y-%m-%d %H:%M})"
@@ -0,0 +1,52 @@
+"""Batch writes until the current transaction commits.
+
+``append(flush, item)`` collects ``item`` for the innermost transaction or
+savepoint open on this thread, and calls ``flush(items)`` once after it
+commits, so many writes in one transaction become a single bulk INSERT.
+Nothing is flushed if the transaction rolls back. Outside a transaction
+``flush([item])`` runs right away.
+"""
+
+import threading
+
+from django.db import transaction
+
+
+_pending = threading.local()
+
+
+class _Batch:
+    """Items collected during one (sub)transaction for one flush function."""
+
+    def __init__(self, flush, savepoint_ids):
+        self._flush = flush
+        self.savepoint_ids = savepoint_ids
+        self.items = []
+        self.flushed = False
+
+    def flush(self):
+        self.flushed = True
+        items, self.items = self.items, []
+        if items:
+            self._flush(items)
+
+    def is_open(self, conn):
+        # Rolled-back transactions and savepoints drop their hooks, and the batch with them.
+        return not self.flushed and any(hook[1] == self.flush for hook in conn.run_on_commit)
+
+
+def append(flush, item):
+    """Queue ``item`` for ``flush(items)`` when the current transaction commits."""
+    conn = transaction.get_connection()
+    if not conn.in_atomic_block:
+        flush([item])
+        return
+    batches = getattr(_pending, "batches", None)
+    if batches is None:
+        batches = _pending.batches = {}
+    savepoint_ids = tuple(conn.savepoint_ids)
+    batch = batches.get(flush)
+    if batch is None or batch.savepoint_ids != savepoint_ids or not batch.is_open(conn):
+        batch = batches[flush] = _Batch(flush, savepoint_ids)
+        transaction.on_commit(batch.flush)
+    batch.items.append(item)
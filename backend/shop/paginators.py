@@ -0,0 +1,56 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that avoids exact ``COUNT(*)`` on big tables.
+
+    Unfiltered Postgres tables use the planner's row estimate from
+    ``pg_class``; everything else uses an exact count cached for a short
+    while, so paging through a changelist doesn't recount on every click.
+    """
+
+    # Below this many rows the estimate isn't worth its inaccuracy.
+    estimate_threshold = 10_000
+
+    def _estimate(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql" or queryset.query.where:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        if not row or row[0] < self.estimate_threshold:
+            # -1 means the table was never analyzed.
+            return None
+        return row[0]
+
+    def _cache_key(self, queryset):
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except Exception:
+            return None
+        digest = hashlib.md5(f"{queryset.db}:{sql}:{params}".encode()).hexdigest()
+        return f"admin-count:{digest}"
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, "query"):
+            return super().count
+        estimate = self._estimate(queryset)
+        if estimate is not None:
+            return estimate
+        key = self._cache_key(queryset)
+        if key is None:
+            return super().count
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, getattr(settings, "ADMIN_COUNT_CACHE_SECONDS", 60))
+        return count
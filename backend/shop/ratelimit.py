@@ -0,0 +1,174 @@
+"""Per-client rate limiting and load shedding for the API.
+
+Each client gets a token bucket per route: ``rate`` tokens per second refill
+a bucket holding at most ``burst`` tokens, and every request spends one.
+Buckets live in the Django cache so all workers share them; if the cache is
+unreachable the limiter keeps working with per-process buckets.
+"""
+
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+from . import auth
+from .views import corsify
+
+
+logger = logging.getLogger(__name__)
+
+
+def _refill(state, rate, burst, now):
+    tokens, updated_at = state if state else (burst, now)
+    return min(burst, tokens + (now - updated_at) * rate)
+
+
+def _spend(tokens, rate):
+    """Return ``(new_tokens, retry_after)``; ``retry_after`` is 0 when allowed."""
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / rate
+
+
+class LocalBucketStore:
+    """In-process buckets, used when the shared cache is unavailable."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        now = time.monotonic()
+        with self._lock:
+            tokens = _refill(self._buckets.get(key), rate, burst, now)
+            tokens, retry_after = _spend(tokens, rate)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > 100_000:
+                # Forget idle clients rather than grow without bound.
+                self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < 600}
+        return retry_after
+
+
+class CacheBucketStore:
+    """Buckets shared through the Django cache.
+
+    Read-modify-write isn't atomic, so concurrent requests from one client
+    can occasionally both get the last token; that slack is acceptable for
+    abuse protection and avoids a lock round trip per request.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def take(self, key, rate, burst):
+        cache = caches[self.alias]
+        now = time.time()
+        tokens = _refill(cache.get(key), rate, burst, now)
+        tokens, retry_after = _spend(tokens, rate)
+        # Keep the entry until the bucket would be full again anyway.
+        cache.set(key, (tokens, now), timeout=math.ceil(burst / rate) + 1)
+        return retry_after
+
+
+_local_store = LocalBucketStore()
+
+
+def take(key, rate, burst):
+    """Spend a token for ``key``; returns seconds to wait, or 0 if allowed."""
+    try:
+        return CacheBucketStore(getattr(settings, "RATE_LIMIT_CACHE", "default")).take(key, rate, burst)
+    except Exception:
+        logger.warning("Rate limit cache unavailable; using in-process buckets", exc_info=True)
+        return _local_store.take(key, rate, burst)
+
+
+def client_ip(request):
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR")
+    proxies = getattr(settings, "RATE_LIMIT_TRUSTED_PROXIES", 0)
+    if forwarded and proxies:
+        # Each trusted proxy appends the address it saw; earlier entries can be forged.
+        hops = [hop.strip() for hop in forwarded.split(",")]
+        return hops[max(len(hops) - proxies, 0)]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def client_key(request):
+    """Identify the caller: access token subject, then logged-in user, then IP address."""
+    claims = auth.authenticate(request)
+    if claims is not None:
+        # Keyed by who, not by token, so refreshing doesn't reset the bucket.
+        return f"{claims['role']}:{claims['sub']}"
+    if settings.SESSION_COOKIE_NAME in request.COOKIES and hasattr(request, "session"):
+        user_id = request.session.get("user_id")
+        if user_id:
+            return f"user:{user_id}"
+    return f"ip:{client_ip(request)}"
+
+
+def _reject(request, status, detail, retry_after):
+    response = JsonResponse({"detail": detail}, status=status)
+    response["Retry-After"] = str(max(math.ceil(retry_after), 1))
+    return corsify(response, request)
+
+
+def in_flight(request):
+    """Requests running in this worker process, as counted by ``RateLimitMiddleware``."""
+    shedder = getattr(request, "_load_shedder", None)
+    return shedder.in_flight if shedder is not None else 0
+
+
+def admit(request, route, in_flight=0):
+    """Return a 503/429 response if ``request`` to ``route`` should be turned away, else None."""
+    max_in_flight = getattr(settings, "LOAD_SHED_MAX_IN_FLIGHT", 0)
+    if (
+        max_in_flight
+        and in_flight > max_in_flight
+        and route in getattr(settings, "LOAD_SHED_LOW_PRIORITY_ROUTES", ())
+    ):
+        return _reject(request, 503, "Server busy, please retry shortly.", getattr(settings, "LOAD_SHED_RETRY_AFTER", 2))
+
+    if not getattr(settings, "RATE_LIMIT_ENABLED", True):
+        return None
+    limits = getattr(settings, "RATE_LIMITS", {})
+    budget = limits.get(route) or getattr(settings, "RATE_LIMIT_DEFAULT", None)
+    if not budget:
+        return None
+    retry_after = take(f"rl:{route}:{client_key(request)}", budget["rate"], budget["burst"])
+    if retry_after:
+        return _reject(request, 429, "Too many requests.", retry_after)
+    return None
+
+
+class RateLimitMiddleware:
+    """Apply ``RATE_LIMITS`` budgets to API routes and shed low-priority load.
+
+    When more than ``LOAD_SHED_MAX_IN_FLIGHT`` requests are running in this
+    process, routes listed in ``LOAD_SHED_LOW_PRIORITY_ROUTES`` get a 503 so
+    checkout and cart requests keep their share of the worker.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        with self._lock:
+            self.in_flight += 1
+        try:
+            return self.get_response(request)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Lets /api/batch/ admit its sub-requests against the live count.
+        request._load_shedder = self
+        match = request.resolver_match
+        if request.method == "OPTIONS" or match is None or not request.path_info.startswith("/api/"):
+            return None
+        return admit(request, match.url_name, self.in_flight)
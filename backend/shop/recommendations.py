@@ -0,0 +1,165 @@
+"""Offline "frequently bought together" model.
+
+Order lines become a sparse order x product incidence matrix ``X``; ``X.T @ X``
+gives how many orders contain each pair of products (the diagonal is each
+product's own order count). Scores are the cosine similarity of two
+products' order sets, and the top-K per product are written to
+``RelatedProduct`` so the API serves them with one indexed query.
+
+The co-occurrence matrix is kept on disk between runs, so incremental runs
+only read orders placed since the previous run. They rescore the products
+in those orders and the products co-purchased with them, which covers every
+score the new orders change.
+"""
+
+import json
+from datetime import timedelta
+from itertools import chain
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedOrderItem, OrderItem, Product, RelatedProduct
+
+
+# Orders younger than this may still be committing; pick them up next run.
+SETTLE_DELAY = timedelta(minutes=1)
+WRITE_BATCH = 5000
+
+
+def _state_paths():
+    base = Path(getattr(settings, "RECOMMENDATIONS_DIR", settings.BASE_DIR / "var" / "recommendations"))
+    return base / "copurchase.npz", base / "copurchase.json"
+
+
+def load_state():
+    """Return ``(cooccurrence, last_order_id)`` from the previous run, or ``(None, 0)``."""
+    matrix_path, meta_path = _state_paths()
+    if not matrix_path.exists() or not meta_path.exists():
+        return None, 0
+    meta = json.loads(meta_path.read_text())
+    return sparse.load_npz(matrix_path).tocsr(), meta["last_order_id"]
+
+
+def save_state(cooccurrence, last_order_id):
+    matrix_path, meta_path = _state_paths()
+    matrix_path.parent.mkdir(parents=True, exist_ok=True)
+    sparse.save_npz(matrix_path, cooccurrence)
+    meta_path.write_text(json.dumps({"last_order_id": last_order_id}))
+
+
+def _lines(queryset):
+    """Fetch (order_id, product_id) pairs as an (n, 2) int64 array without building model objects."""
+    rows = queryset.filter(product_id__isnull=False).order_by().values_list("order_id", "product_id")
+    flat = np.fromiter(chain.from_iterable(rows.iterator(chunk_size=50_000)), dtype=np.int64)
+    return flat.reshape(-1, 2)
+
+
+def cooccurrence_matrix(lines, n_products):
+    """Product x product counts of orders containing both products."""
+    if not len(lines):
+        return sparse.csr_matrix((n_products, n_products), dtype=np.int32)
+    _, order_index = np.unique(lines[:, 0], return_inverse=True)
+    incidence = sparse.csr_matrix(
+        (np.ones(len(lines), dtype=np.int32), (order_index, lines[:, 1])),
+        shape=(order_index.max() + 1, n_products),
+    )
+    # A product listed twice in one order still counts once.
+    incidence.sum_duplicates()
+    incidence.data[:] = 1
+    return (incidence.T @ incidence).tocsr()
+
+
+def _resize(matrix, n):
+    matrix = matrix.tocoo()
+    return sparse.csr_matrix((matrix.data, (matrix.row, matrix.col)), shape=(n, n))
+
+
+def top_k(cooccurrence, k, min_co_purchases=1, rows=None):
+    """Vectorised top-K per row. Returns (product, related, rank, score, count) arrays."""
+    counts = cooccurrence.diagonal().astype(np.float64)
+    pairs = cooccurrence.tocoo()
+    keep = (pairs.row != pairs.col) & (pairs.data >= min_co_purchases)
+    if rows is not None:
+        keep &= np.isin(pairs.row, rows)
+    product, related, together = pairs.row[keep], pairs.col[keep], pairs.data[keep]
+    scores = together / np.sqrt(counts[product] * counts[related])
+
+    # Sort by product, then best score first (ties broken by raw count).
+    order = np.lexsort((-together, -scores, product))
+    product, related, together, scores = product[order], related[order], together[order], scores[order]
+    starts = np.searchsorted(product, product, side="left")
+    rank = np.arange(len(product)) - starts
+    best = rank < k
+    return product[best], related[best], rank[best], scores[best], together[best]
+
+
+def _write(product, related, scores, together, replace_products=None):
+    existing = np.fromiter(Product.objects.values_list("id", flat=True).iterator(), dtype=np.int64)
+    alive = np.isin(related, existing) & np.isin(product, existing)
+    # Re-rank after dropping deleted products so ranks stay contiguous.
+    product, related, scores, together = product[alive], related[alive], scores[alive], together[alive]
+    rank = np.arange(len(product)) - np.searchsorted(product, product, side="left")
+
+    with transaction.atomic():
+        if replace_products is None:
+            RelatedProduct.objects.all().delete()
+        else:
+            for start in range(0, len(replace_products), WRITE_BATCH):
+                chunk = [int(p) for p in replace_products[start:start + WRITE_BATCH]]
+                RelatedProduct.objects.filter(product_id__in=chunk).delete()
+        for start in range(0, len(product), WRITE_BATCH):
+            end = start + WRITE_BATCH
+            RelatedProduct.objects.bulk_create(
+                RelatedProduct(
+                    product_id=int(p), related_id=int(r), rank=int(n), score=float(s), co_purchases=int(c)
+                )
+                for p, r, n, s, c in zip(product[start:end], related[start:end], rank[start:end],
+                                         scores[start:end], together[start:end])
+            )
+    return len(product)
+
+
+def build(k=None, full=False, min_co_purchases=None):
+    """Rebuild (``full``) or incrementally update the related-products table.
+
+    Returns ``(order_lines_read, links_written)``.
+    """
+    k = k or getattr(settings, "RECOMMENDATIONS_TOP_K", 10)
+    min_co_purchases = min_co_purchases or getattr(settings, "RECOMMENDATIONS_MIN_CO_PURCHASES", 1)
+    cutoff = timezone.now() - SETTLE_DELAY
+
+    previous, last_order_id = (None, 0) if full else load_state()
+    new_items = OrderItem.objects.filter(order_id__gt=last_order_id, order__created_at__lt=cutoff)
+    lines = _lines(new_items)
+    new_last = int(lines[:, 0].max()) if len(lines) else last_order_id
+    if previous is None:
+        # Full history: archived orders count as co-purchases too.
+        lines = np.concatenate([lines, _lines(ArchivedOrderItem.objects.all())])
+
+    max_product = Product.objects.order_by("-id").values_list("id", flat=True).first() or 0
+    if len(lines):
+        max_product = max(max_product, int(lines[:, 1].max()))
+    n_products = max(max_product + 1, previous.shape[0] if previous is not None else 0)
+    delta = cooccurrence_matrix(lines, n_products)
+    cooccurrence = delta if previous is None else _resize(previous, n_products) + delta
+
+    if previous is None:
+        product, related, _, scores, together = top_k(cooccurrence, k, min_co_purchases)
+        written = _write(product, related, scores, together)
+    else:
+        # Products in the new orders gained co-purchases, and their order counts
+        # changed, which moves every score they take part in: rescore them and
+        # everything ever bought with them.
+        touched = np.unique(lines[:, 1])
+        affected = np.union1d(touched, cooccurrence[touched].indices)
+        product, related, _, scores, together = top_k(cooccurrence, k, min_co_purchases, rows=affected)
+        written = _write(product, related, scores, together, replace_products=affected)
+
+    save_state(cooccurrence, new_last)
+    return len(lines), written
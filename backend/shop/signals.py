@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import analytics, events, history, singleflight
+from .models import Event, Order, OrderItem, Product
+
+
+def invalidate_on_commit(namespace):
+    # After commit, so a concurrent reader can't re-cache pre-commit data under the new version.
+    transaction.on_commit(lambda: singleflight.invalidate(namespace))
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_changed(sender, **kwargs):
+    invalidate_on_commit("catalog")
+
+
+@receiver([post_save, post_delete], sender=Order)
+@receiver([post_save, post_delete], sender=OrderItem)
+def order_changed(sender, **kwargs):
+    invalidate_on_commit("orders")
+
+
+@receiver([post_save, post_delete], sender=OrderItem)
+def order_lines_changed(sender, **kwargs):
+    transaction.on_commit(analytics.orders_changed)
+
+
+@receiver(post_save, sender=Order)
+def order_status_changed(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_loaded_status", None)
+    if created or previous is None or previous == instance.status:
+        return
+    instance._loaded_status = instance.status
+    events.publish(
+        Event.ORDER_STATUS_CHANGED,
+        {
+            "order_id": str(instance.public_id),
+            "status": instance.status,
+            "previous_status": previous,
+            "estimated_delivery": instance.estimated_delivery.isoformat() if instance.estimated_delivery else None,
+        },
+        order_public_id=instance.public_id,
+    )
+
+
+@receiver(pre_save, sender=Product)
+def product_saving(sender, instance, **kwargs):
+    # A new upload is stored (and referenced) during the save, even with the same name.
+    instance._image_uploaded = bool(instance.image) and not instance.image._committed
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, **kwargs):
+    # History first: it compares against the loaded stock, which the event below resets.
+    history.record(instance, created, getattr(instance, "_change_reason", None))
+    product_stock_changed(instance, created)
+    product_image_changed(instance)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    history.record_deleted(instance)
+    release_on_commit(instance.image.storage, instance.image.name)
+
+
+def release_on_commit(storage, name):
+    """Drop the reference to a replaced or deleted file once the change is committed."""
+    if name:
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+def product_image_changed(instance):
+    previous = getattr(instance, "_loaded_image", None)
+    if previous != instance.image.name or getattr(instance, "_image_uploaded", False):
+        release_on_commit(instance.image.storage, previous)
+        instance._loaded_image = instance.image.name
+
+
+def product_stock_changed(instance, created):
+    previous = getattr(instance, "_loaded_stock", None)
+    # Stock may still be the string the API was sent (see history.record).
+    stock = int(instance.stock)
+    if not created and previous == stock:
+        return
+    instance._loaded_stock = stock
+    events.publish(Event.STOCK_CHANGED, {"product_id": instance.id, "stock": stock})
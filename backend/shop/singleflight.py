@@ -0,0 +1,181 @@
+"""Request coalescing with stale-while-revalidate caching.
+
+``cached()`` serves a value from the Django cache. When it is missing, only
+one caller per process computes it (others in the process wait for that
+result), and a cache lock keeps other processes from computing it at the
+same time. When it is stale but still within the stale window, callers get
+the old value immediately while one background thread refreshes it.
+
+Keys are scoped by a namespace version; ``invalidate(namespace)`` bumps the
+version so the next request recomputes instead of serving stale data.
+``mark_stale(namespace)`` is the softer option for expensive values: entries
+computed before the call are served once more while they refresh.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+
+logger = logging.getLogger(__name__)
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+_stats = defaultdict(Counter)
+_stats_lock = threading.Lock()
+
+
+def _count(name, event):
+    with _stats_lock:
+        _stats[name][event] += 1
+
+
+def stats():
+    """Per-name counters: hits, stale, misses, computed, coalesced, lock_waits."""
+    with _stats_lock:
+        return {name: dict(counter) for name, counter in _stats.items()}
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+def do(key, fn, name=None):
+    """Run ``fn`` once for all concurrent callers in this process using the same key."""
+    with _inflight_lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+    if not leader:
+        _count(name or key, "coalesced")
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.value
+    try:
+        call.value = fn()
+        return call.value
+    except Exception as exc:
+        call.error = exc
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        call.done.set()
+
+
+def version(namespace):
+    """The namespace's current version; it changes on every ``invalidate()``."""
+    key = f"sf-version:{namespace}"
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        cache.add(key, version, timeout=None)
+        version = cache.get(key, version)
+    return version
+
+
+def invalidate(namespace):
+    """Make every key in ``namespace`` miss on its next read."""
+    cache.set(f"sf-version:{namespace}", time.time_ns(), timeout=None)
+
+
+def mark_stale(namespace):
+    """Treat every entry in ``namespace`` computed before now as past its TTL."""
+    cache.set(f"sf-stale:{namespace}", time.time(), timeout=None)
+
+
+def _is_fresh(entry, ttl, stale_since):
+    fresh_until = entry[1]
+    # fresh_until - ttl is when the entry was computed.
+    return time.time() < fresh_until and fresh_until - ttl >= stale_since
+
+
+def _store(cache_key, fn, ttl, stale_ttl):
+    # Freshness counts from when the computation started, so a mark_stale()
+    # during it isn't missed.
+    started = time.time()
+    value = fn()
+    try:
+        cache.set(cache_key, (value, started + ttl), timeout=ttl + stale_ttl)
+    except Exception:
+        logger.warning("Could not cache %s", cache_key, exc_info=True)
+    return value
+
+
+def _compute(cache_key, fn, ttl, stale_ttl, name):
+    lock_key = f"{cache_key}:lock"
+    lock_timeout = getattr(settings, "SINGLEFLIGHT_LOCK_SECONDS", 30)
+    if cache.add(lock_key, 1, timeout=lock_timeout):
+        try:
+            _count(name, "computed")
+            return _store(cache_key, fn, ttl, stale_ttl)
+        finally:
+            cache.delete(lock_key)
+
+    # Another process is computing it; wait briefly for its result.
+    _count(name, "lock_waits")
+    deadline = time.monotonic() + getattr(settings, "SINGLEFLIGHT_WAIT_SECONDS", 5)
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(cache_key)
+        if entry is not None:
+            return entry[0]
+    _count(name, "computed")
+    return _store(cache_key, fn, ttl, stale_ttl)
+
+
+def _refresh_in_background(cache_key, fn, ttl, stale_ttl, name):
+    lock_key = f"{cache_key}:lock"
+    if not cache.add(lock_key, 1, timeout=getattr(settings, "SINGLEFLIGHT_LOCK_SECONDS", 30)):
+        return  # Someone is already refreshing it.
+
+    def refresh():
+        try:
+            _count(name, "computed")
+            _store(cache_key, fn, ttl, stale_ttl)
+        except Exception:
+            logger.exception("Background refresh of %s failed", cache_key)
+        finally:
+            cache.delete(lock_key)
+            connection.close()
+
+    threading.Thread(target=refresh, name=f"refresh-{name}", daemon=True).start()
+
+
+def cached(namespace, key, fn, ttl, stale_ttl=None):
+    """Return ``fn()``'s result via the cache, coalescing concurrent computations."""
+    if stale_ttl is None:
+        stale_ttl = getattr(settings, "SINGLEFLIGHT_STALE_SECONDS", 300)
+    name = f"{namespace}:{key}"
+    try:
+        cache_key = f"sf:{namespace}:{version(namespace)}:{key}"
+        stale_key = f"sf-stale:{namespace}"
+        # One round trip for the entry and the namespace's stale marker.
+        found = cache.get_many([cache_key, stale_key])
+        entry = found.get(cache_key)
+        fresh = entry is not None and _is_fresh(entry, ttl, found.get(stale_key, 0))
+    except Exception:
+        # Cache down: still coalesce within this process.
+        logger.warning("Cache unavailable for %s", name, exc_info=True)
+        return do(f"sf:{name}", fn, name)
+    if entry is not None:
+        value = entry[0]
+        if fresh:
+            _count(name, "hits")
+        else:
+            _count(name, "stale")
+            _refresh_in_background(cache_key, fn, ttl, stale_ttl, name)
+        return value
+
+    _count(name, "misses")
+    return do(cache_key, lambda: _compute(cache_key, fn, ttl, stale_ttl, name), name)
@@ -0,0 +1,116 @@
+"""Background jobs run by ``manage.py run_workers``."""
+
+import logging
+import os
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.mail import mail_admins, send_mail
+from django.utils import timezone
+from PIL import Image
+
+from . import forecast
+from .jobs import job
+from .models import Event, Order, Product, StockForecast
+from .signals import invalidate_on_commit
+
+
+logger = logging.getLogger(__name__)
+
+
+@job("shop.send_order_confirmation")
+def send_order_confirmation(order_id):
+    try:
+        order = Order.objects.prefetch_related("items").get(id=order_id)
+    except Order.DoesNotExist:
+        return
+    lines = [f"- {item.product_name} x {item.quantity}: ${item.subtotal:.2f}" for item in order.items.all()]
+    delivery = order.estimated_delivery.isoformat() if order.estimated_delivery else "TBD"
+    message = (
+        f"Hi {order.customer_name},\n\n"
+        f"Thanks for your order {order.public_id}.\n\n"
+        + "\n".join(lines)
+        + f"\n\nTotal: ${order.total_amount:.2f}\nEstimated delivery: {delivery}\n"
+    )
+    send_mail(f"Order {order.public_id} confirmed", message, None, [order.customer_email])
+
+
+@job("shop.check_stock_alerts")
+def check_stock_alerts(product_ids):
+    threshold = getattr(settings, "LOW_STOCK_THRESHOLD", 5)
+    low = list(
+        Product.objects.filter(id__in=product_ids, stock__lte=threshold)
+        .order_by("stock")
+        .values_list("name", "stock")
+    )
+    if not low:
+        return
+    for name, stock in low:
+        logger.warning("Low stock: %s has %s left", name, stock)
+    mail_admins(
+        f"{len(low)} product(s) low on stock",
+        "\n".join(f"- {name}: {stock} left" for name, stock in low),
+    )
+
+
+@job("shop.forecast_stock")
+def forecast_stock():
+    """Rebuild restock forecasts and email admins about products that just became at risk."""
+    _, newly_at_risk = forecast.build()
+    if not newly_at_risk:
+        return
+    rows = (
+        StockForecast.objects.filter(product_id__in=newly_at_risk)
+        .select_related("product")
+        .order_by("days_until_stockout")[:50]
+    )
+    lines = [
+        f"- {row.product.name}: {row.stock} left, ~{row.units_per_day:.1f}/day, "
+        f"out by {row.stockout_date or 'unknown'}"
+        for row in rows
+    ]
+    mail_admins(f"{len(newly_at_risk)} product(s) at risk of selling out", "\n".join(lines))
+
+
+@job("shop.process_product_image")
+def process_product_image(product_id):
+    """Downscale oversized product uploads so pages don't ship camera-sized images."""
+    try:
+        product = Product.objects.get(id=product_id)
+    except Product.DoesNotExist:
+        return
+    if not product.image:
+        return
+
+    max_size = getattr(settings, "PRODUCT_IMAGE_MAX_SIZE", 1200)
+    old_name = product.image.name
+    with product.image.open("rb") as f:
+        image = Image.open(f)
+        image_format = image.format or "JPEG"
+        image.load()
+    if max(image.size) <= max_size:
+        return
+
+    image.thumbnail((max_size, max_size))
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, optimize=True)
+    storage = product.image.storage
+    resized_name = product.image.field.generate_filename(product, f"resized_{os.path.basename(old_name)}")
+    new_name = storage.save(resized_name, ContentFile(buffer.getvalue()))
+
+    # Only swap the file if nobody replaced the image while we were resizing.
+    # update() sends no post_save, so bump updated_at (feeds) and the catalog cache here.
+    if Product.objects.filter(id=product.id, image=old_name).update(image=new_name, updated_at=timezone.now()):
+        invalidate_on_commit("catalog")
+        storage.delete(old_name)
+    else:
+        storage.delete(new_name)
+
+
+@job("shop.prune_events")
+def prune_events():
+    """Drop stream events older than anyone could still resume from."""
+    hours = getattr(settings, "SSE_EVENT_RETENTION_HOURS", 24)
+    Event.objects.filter(created_at__lt=timezone.now() - timedelta(hours=hours)).delete()
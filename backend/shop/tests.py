@@ -1,3 +1,116 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import auth, jobs
+from .models import Admin, Job, Order, Product, ProductChangeLog, RevokedToken, User
+
+
+class ProductStockHistoryTests(TestCase):
+    def setUp(self):
+        admin = Admin(username="admin")
+        admin.set_password("secret")
+        admin.save()
+        self.headers = {"HTTP_AUTHORIZATION": "Bearer " + auth.issue(admin.id, auth.ADMIN)["access_token"]}
+
+    def test_string_stock_is_recorded(self):
+        # The admin pages send form input values, so stock arrives as a string.
+        # History rows are written on commit.
+        with self.captureOnCommitCallbacks(execute=True):
+            created = self.client.post(
+                "/api/products/",
+                {"name": "Mug", "price": "9.50", "stock": "5"},
+                content_type="application/json",
+                **self.headers,
+            )
+            self.assertEqual(created.status_code, 201)
+            product_id = created.json()["id"]
+            updated = self.client.patch(
+                f"/api/products/{product_id}/", {"stock": "7"}, content_type="application/json", **self.headers
+            )
+            self.assertEqual(updated.status_code, 200)
+
+        rows = ProductChangeLog.objects.filter(product_id=product_id).order_by("id")
+        self.assertEqual(
+            [(row.reason, row.stock, row.stock_delta) for row in rows],
+            [(ProductChangeLog.CREATED, 5, 5), (ProductChangeLog.UPDATED, 7, 2)],
+        )
+
+    def test_resaving_string_stock_is_not_a_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name="Mug", price="9.50", stock="5")
+            product.save()
+        self.assertEqual(ProductChangeLog.objects.filter(product_id=product.id).count(), 1)
+
+
+class RefreshTokenTests(TestCase):
+    def test_refresh_token_works_once(self):
+        tokens = auth.issue(1, auth.USER)
+        self.assertIsNotNone(auth.refresh(tokens["refresh_token"]))
+        self.assertIsNone(auth.refresh(tokens["refresh_token"]))
+
+    @override_settings(AUTH_REVOCATION_CHECK_SECONDS=0)
+    def test_revocations_from_other_processes_are_loaded(self):
+        tokens = auth.issue(1, auth.USER)
+        claims = auth.verify(tokens["access_token"])
+        self.assertIsNotNone(claims)
+        # As written by a logout in another worker, which this process's memory hasn't seen.
+        RevokedToken.objects.create(
+            jti=claims["jti"], kind=RevokedToken.ACCESS, expires_at=timezone.now() + timedelta(minutes=5)
+        )
+        self.assertIsNone(auth.verify(tokens["access_token"]))
+
+
+class JobHousekeepingTests(TestCase):
+    @override_settings(JOB_SCHEDULE={"shop.forecast_stock": 3600}, JOB_LOCK_TIMEOUT_SECONDS=60)
+    def test_housekeeping_requeues_stale_jobs_and_schedules_once(self):
+        stale = Job.objects.create(
+            name="shop.send_order_confirmation",
+            status=Job.RUNNING,
+            locked_by="dead:1",
+            locked_at=timezone.now() - timedelta(minutes=5),
+        )
+        jobs.housekeeping()
+        jobs.housekeeping()
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, Job.QUEUED)
+        scheduled = Job.objects.filter(name="shop.forecast_stock")
+        self.assertEqual(scheduled.count(), 1)
+        self.assertGreater(scheduled.get().run_at, timezone.now() + timedelta(minutes=59))
+
+
+class StreamTicketTests(TestCase):
+    def test_ticket_opens_the_admin_stream_once(self):
+        headers = {"HTTP_AUTHORIZATION": "Bearer " + auth.issue(1, auth.ADMIN)["access_token"]}
+        ticket = self.client.post("/api/events/ticket/", **headers).json()["ticket"]
+        response = self.client.get("/api/events/", {"ticket": ticket})
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        self.assertEqual(self.client.get("/api/events/", {"ticket": ticket}).status_code, 401)
+
+    def test_access_token_is_not_a_ticket(self):
+        access_token = auth.issue(1, auth.ADMIN)["access_token"]
+        self.assertEqual(self.client.get("/api/events/", {"ticket": access_token}).status_code, 401)
+        self.assertEqual(self.client.post("/api/events/ticket/").status_code, 401)
+
+
+class CustomerOrderAccessTests(TestCase):
+    def setUp(self):
+        self.user = User(username="ann")
+        self.user.set_password("secret")
+        self.user.save()
+        self.order = Order.objects.create(user=self.user, customer_name="Ann", customer_email="ann@example.com")
+
+    def test_session_login_alone_cannot_read_orders(self):
+        # The session cookie is sent on cross-origin requests too; reads need the bearer token.
+        session = self.client.session
+        session["user_id"] = self.user.id
+        session.save()
+        self.assertEqual(self.client.get("/api/user/orders/").status_code, 401)
+        self.assertEqual(self.client.get(f"/api/orders/{self.order.public_id}/").status_code, 404)
+
+        headers = {"HTTP_AUTHORIZATION": "Bearer " + auth.issue(self.user.id, auth.USER)["access_token"]}
+        response = self.client.get("/api/user/orders/", **headers)
+        self.assertEqual([order["order_id"] for order in response.json()["results"]], [str(self.order.public_id)])
+        self.assertEqual(self.client.get(f"/api/orders/{self.order.public_id}/", **headers).status_code, 200)
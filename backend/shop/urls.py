@@ -1,17 +1,32 @@
 from django.urls import path
-from . import views
+from . import batch, views
 
 
 urlpatterns = [
     path("products/", views.products, name="products"),
+    path("products/history/", views.catalog_history, name="catalog_history"),
     path("products/<int:product_id>/", views.product_detail, name="product_detail"),
+    path("products/<int:product_id>/history/", views.product_history, name="product_history"),
+    path("products/<int:product_id>/related/", views.related_products, name="related_products"),
     path("products/<int:product_id>/upload-image/", views.product_upload_image, name="product_upload_image"),
     path("cart/", views.cart, name="cart"),
     path("checkout/", views.checkout, name="checkout"),
     path("orders/", views.orders, name="orders"),
+    path("orders/<uuid:public_id>/", views.order_detail, name="order_detail"),
     path("analytics/daily-orders/", views.daily_orders, name="daily_orders"),
+    path("analytics/stock-velocity/", views.stock_velocity, name="stock_velocity"),
+    path("analytics/stock-forecast/", views.stock_forecast, name="stock_forecast"),
+    path("analytics/revenue/", views.revenue_analytics, name="revenue_analytics"),
+    path("analytics/top-products/", views.top_products_analytics, name="top_products_analytics"),
+    path("events/", views.event_stream, name="event_stream"),
+    path("events/ticket/", views.stream_ticket, name="stream_ticket"),
+    path("metrics/", views.metrics, name="metrics"),
     path("user/signup/", views.user_signup, name="user_signup"),
     path("user/login/", views.user_login, name="user_login"),
+    path("user/orders/", views.user_orders, name="user_orders"),
     path("admin/login/", views.admin_login, name="admin_login"),
+    path("auth/refresh/", views.auth_refresh, name="auth_refresh"),
+    path("auth/logout/", views.auth_logout, name="auth_logout"),
+    path("batch/", batch.batch, name="batch"),
 ]
 
@@ -1,17 +1,28 @@
+import base64
 import json
 import os
-from datetime import date, timedelta
+import uuid
+from functools import wraps
+from datetime import date, datetime, timedelta
+from urllib.parse import urlencode
 
-from django.db import models
+from django.db import models, transaction
 from django.db.models.functions import TruncDate
-from django.http import JsonResponse, HttpResponse
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import Paginator
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 
-from .models import Product, Order, OrderItem, User, Admin
+from . import analytics, auth, events, forecast, health, history, singleflight, tasks
+from .archive import find_order, order_history
+from .db_router import replica_reads, routing_state
+from .jobs import enqueue_on_commit
+from .models import Product, Order, OrderItem, User, Admin, Event, ProductChangeLog, RelatedProduct, StockForecast
 
 
-ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "changemeadmin")
-
 def home(request):
     """Tiny landing page so visiting http://127.0.0.1:8000/ doesn't 404."""
     data = {
@@ -26,6 +37,21 @@ def home(request):
     return corsify(JsonResponse(data), request)
 
 
+def health_live(request):
+    """Liveness: the process is up. Checks no dependencies, so a slow database can't get workers killed."""
+    response = JsonResponse(health.live())
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+def health_ready(request):
+    """Readiness: 200 when the database, migrations, cache and media storage check out, else 503."""
+    report = health.ready()
+    response = JsonResponse(report, status=200 if report["status"] == "ok" else 503)
+    response["Cache-Control"] = "no-store"
+    return response
+
+
 def corsify(response: HttpResponse, request=None) -> HttpResponse:
     """Attach permissive CORS headers so the static frontend can call the API."""
     origin = "*"
@@ -34,11 +60,30 @@ def corsify(response: HttpResponse, request=None) -> HttpResponse:
 
     response["Access-Control-Allow-Origin"] = origin
     response["Access-Control-Allow-Credentials"] = "true"
-    response["Access-Control-Allow-Headers"] = "Content-Type, X-Admin-Token"
+    response["Access-Control-Allow-Headers"] = "Authorization, Content-Type, X-Admin-Token"
     response["Access-Control-Allow-Methods"] = "GET, POST, PATCH, DELETE, OPTIONS"
     return response
 
 
+def cached_body(namespace, key, build, ttl):
+    """``build()`` as JSON bytes, shared by concurrent requests and cached for ``ttl`` seconds.
+
+    Fills read from the primary: a lagging replica could otherwise cache
+    pre-write data under the version the write just bumped.
+    """
+
+    def fill():
+        with routing_state(None):
+            return json.dumps(build()).encode()
+
+    return singleflight.cached(namespace, key, fill, ttl)
+
+
+def cached_json(request, namespace, key, build, ttl):
+    body = cached_body(namespace, key, build, ttl)
+    return corsify(HttpResponse(body, content_type="application/json"), request)
+
+
 def parse_json(request):
     try:
         return json.loads(request.body or "{}")
@@ -46,16 +91,30 @@ def parse_json(request):
         return {}
 
 
-def ensure_admin(request):
-    token = request.headers.get("X-Admin-Token")
-    return token == ADMIN_TOKEN
-
-
 def handle_options(request):
     resp = JsonResponse({"ok": True})
     return corsify(resp, request)
 
 
+def admin_required(view=None, *, methods=None):
+    """Answer 401 unless the request carries an admin access token (see shop/auth.py).
+
+    Only ``methods`` are checked when given; OPTIONS preflights always pass.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            checked = request.method != "OPTIONS" and (methods is None or request.method in methods)
+            if checked and not auth.is_admin(request):
+                return corsify(JsonResponse({"detail": "Admin token required."}, status=401), request)
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator(view) if view is not None else decorator
+
+
 def serialize_product(product: Product):
     uploaded_image_url = product.image.url if product.image else None
     effective_image_url = uploaded_image_url or product.image_url
@@ -91,18 +150,33 @@ def serialize_order(order: Order):
     }
 
 
+def serialize_order_event(order: Order):
+    """``serialize_order`` without the customer's name and email.
+
+    Events are stored and can be replayed, so listeners that need those
+    fetch the order from ``order_detail``.
+    """
+    data = serialize_order(order)
+    del data["customer_name"], data["customer_email"]
+    return data
+
+
+
+def catalog():
+    return [serialize_product(p) for p in Product.objects.all().order_by("id")]
+
+
 @csrf_exempt
+@replica_reads
+@admin_required(methods=("POST",))
 def products(request):
     if request.method == "OPTIONS":
         return handle_options(request)
 
     if request.method == "GET":
-        data = [serialize_product(p) for p in Product.objects.all().order_by("id")]
-        return corsify(JsonResponse(data, safe=False), request)
+        return cached_json(request, "catalog", "products", catalog, settings.CATALOG_CACHE_SECONDS)
 
     if request.method == "POST":
-        if not ensure_admin(request):
-            return corsify(JsonResponse({"detail": "Admin token required."}, status=401), request)
         payload = parse_json(request)
         product = Product.objects.create(
             name=payload.get("name", "New Product"),
@@ -117,6 +191,8 @@ def products(request):
 
 
 @csrf_exempt
+@replica_reads
+@admin_required(methods=("PUT", "PATCH", "DELETE"))
 def product_detail(request, product_id: int):
     if request.method == "OPTIONS":
         return handle_options(request)
@@ -130,8 +206,6 @@ def product_detail(request, product_id: int):
         return corsify(JsonResponse(serialize_product(product)), request)
 
     if request.method in ("PUT", "PATCH"):
-        if not ensure_admin(request):
-            return corsify(JsonResponse({"detail": "Admin token required."}, status=401), request)
         payload = parse_json(request)
         for field in ["name", "price", "description", "image_url", "stock"]:
             if field in payload:
@@ -140,8 +214,6 @@ def product_detail(request, product_id: int):
         return corsify(JsonResponse(serialize_product(product)), request)
 
     if request.method == "DELETE":
-        if not ensure_admin(request):
-            return corsify(JsonResponse({"detail": "Admin token required."}, status=401), request)
         product.delete()
         return corsify(JsonResponse({"deleted": True}), request)
 
@@ -149,6 +221,30 @@ def product_detail(request, product_id: int):
 
 
 @csrf_exempt
+@replica_reads
+def related_products(request, product_id: int):
+    """Products frequently bought together with this one, best match first."""
+    if request.method == "OPTIONS":
+        return handle_options(request)
+
+    if request.method != "GET":
+        return corsify(JsonResponse({"detail": "Method not allowed."}, status=405), request)
+
+    try:
+        limit = min(max(int(request.GET.get("limit", 5)), 1), 50)
+    except ValueError:
+        limit = 5
+    links = (
+        RelatedProduct.objects.filter(product_id=product_id)
+        .select_related("related")
+        .order_by("rank")[:limit]
+    )
+    data = [{**serialize_product(link.related), "score": link.score} for link in links]
+    return corsify(JsonResponse(data, safe=False), request)
+
+
+@csrf_exempt
+@admin_required(methods=("POST",))
 def product_upload_image(request, product_id: int):
     """Admin-only endpoint to upload a product image using multipart form-data."""
     if request.method == "OPTIONS":
@@ -157,9 +253,6 @@ def product_upload_image(request, product_id: int):
     if request.method != "POST":
         return corsify(JsonResponse({"detail": "Method not allowed."}, status=405), request)
 
-    if not ensure_admin(request):
-        return corsify(JsonResponse({"detail": "Admin token required."}, status=401), request)
-
     try:
         product = Product.objects.get(id=product_id)
     except Product.DoesNotExist:
@@ -171,6 +264,7 @@ def product_upload_image(request, product_id: int):
 
     product.image = uploaded
     product.save()
+    enqueue_on_commit(tasks.process_product_image, {"product_id": product.id})
     return corsify(JsonResponse(serialize_product(product)), request)
 
 
@@ -262,31 +356,45 @@ def checkout(request):
     if not cart_data:
         return corsify(JsonResponse({"detail": "Cart is empty."}, status=400), request)
 
-    order = Order.objects.create(
-        customer_name=customer_name,
-        customer_email=customer_email,
-        status="Order Placed",
-        estimated_delivery=date.today() + timedelta(days=5),
-    )
+    user_id = auth.user_id(request)
+    user = User.objects.filter(id=user_id).first() if user_id else None
 
-    for product_id, qty in cart_data.items():
-        try:
-            product = Product.objects.get(id=product_id)
-        except Product.DoesNotExist:
-            continue
-        OrderItem.objects.create(
-            order=order,
-            product=product,
-            product_name=product.name,
-            quantity=qty,
-            price_per_unit=product.price,
+    with transaction.atomic():
+        order = Order.objects.create(
+            user=user,
+            customer_name=customer_name,
+            customer_email=customer_email,
+            status="Order Placed",
+            estimated_delivery=date.today() + timedelta(days=5),
         )
-        # Reduce stock but do not allow negative values
-        product.stock = max(product.stock - qty, 0)
-        product.save()
 
-    # Clear cart after checkout
+        product_ids = []
+        for product_id, qty in cart_data.items():
+            try:
+                product = Product.objects.get(id=product_id)
+            except Product.DoesNotExist:
+                continue
+            OrderItem.objects.create(
+                order=order,
+                product=product,
+                product_name=product.name,
+                quantity=qty,
+                price_per_unit=product.price,
+            )
+            # Reduce stock but do not allow negative values
+            product.stock = max(product.stock - qty, 0)
+            product._change_reason = ProductChangeLog.SALE
+            product.save()
+            product_ids.append(product.id)
+
+        events.publish(Event.ORDER_CREATED, serialize_order_event(order), order_public_id=order.public_id)
+        # Side effects run in the job workers once the order is committed.
+        enqueue_on_commit(tasks.send_order_confirmation, {"order_id": order.id})
+        enqueue_on_commit(tasks.check_stock_alerts, {"product_ids": product_ids})
+
+    # Clear cart after checkout, and remember the order so this browser can look it up.
     request.session["cart"] = {}
+    request.session["order_ids"] = (request.session.get("order_ids", []) + [str(order.public_id)])[-20:]
     request.session.save()
 
     response_data = {
@@ -298,36 +406,342 @@ def checkout(request):
 
 
 @csrf_exempt
+@replica_reads
+@admin_required
 def orders(request):
     if request.method == "OPTIONS":
         return handle_options(request)
 
-    if not ensure_admin(request):
-        return corsify(JsonResponse({"detail": "Admin token required."}, status=401), request)
-
     if request.method == "GET":
-        data = [serialize_order(o) for o in Order.objects.all().order_by("-created_at")]
-        return corsify(JsonResponse(data, safe=False), request)
+        email = request.GET.get("email", "").strip()
+        queryset = Order.objects.prefetch_related("items").order_by("-created_at")
+        if email:
+            # Served by the (customer_email, created_at) index.
+            queryset = queryset.filter(customer_email=email)
+        return cached_json(
+            request,
+            "orders",
+            f"email:{email}" if email else "all",
+            lambda: [serialize_order(o) for o in queryset],
+            settings.ORDERS_CACHE_SECONDS,
+        )
 
     return corsify(JsonResponse({"detail": "Method not allowed."}, status=405), request)
 
 
+def can_view_order(request, public_id, order=None):
+    """Admins can see any order; customers those placed from this session, or their own with an access token."""
+    if auth.is_admin(request) or str(public_id) in request.session.get("order_ids", []):
+        return True
+    user_id = auth.token_user_id(request)
+    if not user_id:
+        return False
+    order = order or find_order(public_id)
+    return order is not None and order.user_id == user_id
+
+
 @csrf_exempt
-def daily_orders(request):
+@replica_reads
+def order_detail(request, public_id):
+    """Look up a single order by its public id, including archived orders.
+
+    Admins can see any order; customers can see orders placed from this
+    session, or under their account with their access token.
+    """
+    if request.method == "OPTIONS":
+        return handle_options(request)
+
+    if request.method != "GET":
+        return corsify(JsonResponse({"detail": "Method not allowed."}, status=405), request)
+
+    order = find_order(public_id)
+    if order is None or not can_view_order(request, public_id, order):
+        return corsify(JsonResponse({"detail": "Order not found."}, status=404), request)
+    return corsify(JsonResponse(serialize_order(order)), request)
+
+
+def encode_cursor(order):
+    raw = f"{order.created_at.isoformat()}|{order.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    created_at, order_id = raw.rsplit("|", 1)
+    return datetime.fromisoformat(created_at), int(order_id)
+
+
+@csrf_exempt
+@replica_reads
+def user_orders(request):
+    """The logged-in customer's order history, newest first. Needs their access token.
+
+    Paginate with ``?limit=`` and the ``next_cursor`` from the previous page.
+    """
+    if request.method == "OPTIONS":
+        return handle_options(request)
+
+    if request.method != "GET":
+        return corsify(JsonResponse({"detail": "Method not allowed."}, status=405), request)
+
+    user_id = auth.token_user_id(request)
+    if not user_id:
+        return corsify(JsonResponse({"detail": "Login required."}, status=401), request)
+
+    try:
+        limit = min(max(int(request.GET.get("limit", 20)), 1), 100)
+        cursor = request.GET.get("cursor")
+        before = decode_cursor(cursor) if cursor else None
+    except (ValueError, UnicodeDecodeError):
+        return corsify(JsonResponse({"detail": "Invalid pagination parameters."}, status=400), request)
+
+    page, has_more = order_history(user_id, before, limit)
+    data = {
+        "results": [serialize_order(order) for order in page],
+        "next_cursor": encode_cursor(page[-1]) if has_more else None,
+    }
+    return corsify(JsonResponse(data), request)
+
+
+@csrf_exempt
+@replica_reads
+@admin_required
+def catalog_history(request):
+    """Prices and stock for the whole catalog as of ``?as_of=`` (a date or datetime)."""
+    if request.method == "OPTIONS":
+        return handle_options(request)
+
+    try:
+        as_of = history.parse_moment(request.GET["as_of"]) if request.GET.get("as_of") else timezone.now()
+    except ValueError as exc:
+        return corsify(JsonResponse({"detail": str(exc)}, status=400), request)
+
+    return corsify(JsonResponse({"as_of": as_of.isoformat(), "products": history.snapshot(as_of)}), request)
+
+
+@csrf_exempt
+@replica_reads
+@admin_required
+def product_history(request, product_id: int):
+    """One product's price and stock changes, newest first; filter with ``?since=`` and ``?until=``."""
     if request.method == "OPTIONS":
         return handle_options(request)
 
-    if not ensure_admin(request):
-        return corsify(JsonResponse({"detail": "Admin token required."}, status=401), request)
+    try:
+        since = history.parse_moment(request.GET["since"], end_of_day=False) if request.GET.get("since") else None
+        until = history.parse_moment(request.GET["until"]) if request.GET.get("until") else None
+    except ValueError as exc:
+        return corsify(JsonResponse({"detail": str(exc)}, status=400), request)
+
+    changes = history.product_history(product_id, since, until)
+    return corsify(JsonResponse({"product_id": product_id, "changes": changes}), request)
 
-    counts = (
-        Order.objects.annotate(day=TruncDate("created_at"))
-        .values("day")
-        .order_by("day")
-        .annotate(total=models.Count("id"))
+
+@csrf_exempt
+@replica_reads
+@admin_required
+def stock_velocity(request):
+    """Sales rate and days of stock left per product over the last ``?days=`` (default 30)."""
+    if request.method == "OPTIONS":
+        return handle_options(request)
+
+    try:
+        days = min(max(int(request.GET.get("days", 30)), 1), 365)
+    except ValueError:
+        return corsify(JsonResponse({"detail": "days must be an integer."}, status=400), request)
+
+    return corsify(JsonResponse({"days": days, "products": history.stock_velocity(days)}), request)
+
+
+@csrf_exempt
+@replica_reads
+@admin_required
+def stock_forecast(request):
+    """Products at risk of selling out, soonest first.
+
+    ``?days=`` widens or narrows the risk window, ``?all=1`` lists every
+    forecast (products that are selling or low on stock), and ``?page=`` / ``?page_size=`` paginate.
+    """
+    if request.method == "OPTIONS":
+        return handle_options(request)
+
+    try:
+        risk_days = float(request.GET["days"]) if request.GET.get("days") else None
+        page_size = min(max(int(request.GET.get("page_size", 50)), 1), 200)
+        page_number = max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        return corsify(JsonResponse({"detail": "Invalid query parameters."}, status=400), request)
+
+    forecasts = StockForecast.objects.select_related("product")
+    if request.GET.get("all") != "1":
+        forecasts = forecast.at_risk(forecasts, risk_days)
+    forecasts = forecasts.order_by(
+        models.F("days_until_stockout").asc(nulls_last=True), "stock", "product_id"
     )
-    data = [{"date": c["day"].isoformat() if c["day"] else None, "orders": c["total"]} for c in counts]
-    return corsify(JsonResponse(data, safe=False), request)
+    paginator = Paginator(forecasts, page_size)
+    page = paginator.get_page(page_number)
+    data = {
+        "count": paginator.count,
+        "page": page.number,
+        "num_pages": paginator.num_pages,
+        "results": [
+            {
+                "product_id": row.product_id,
+                "name": row.product.name,
+                "stock": row.stock,
+                "units_per_day": round(row.units_per_day, 3),
+                "units_last_30_days": row.units_last_30_days,
+                "days_until_stockout": None if row.days_until_stockout is None else round(row.days_until_stockout, 1),
+                "stockout_date": row.stockout_date.isoformat() if row.stockout_date else None,
+                "computed_at": row.computed_at.isoformat(),
+            }
+            for row in page
+        ],
+    }
+    return corsify(JsonResponse(data), request)
+
+
+def parse_date_range(request, default_days=30):
+    """``?start=`` and ``?end=`` as dates (inclusive), defaulting to the last ``default_days`` days."""
+    end = date.fromisoformat(request.GET["end"]) if request.GET.get("end") else timezone.localdate()
+    start = (
+        date.fromisoformat(request.GET["start"]) if request.GET.get("start") else end - timedelta(days=default_days - 1)
+    )
+    if start > end:
+        raise ValueError("start must not be after end.")
+    return start, end
+
+
+@csrf_exempt
+@replica_reads
+@admin_required
+def revenue_analytics(request):
+    """Revenue, orders, units and AOV per ``?granularity=`` (day, week or month) between two dates."""
+    if request.method == "OPTIONS":
+        return handle_options(request)
+
+    granularity = request.GET.get("granularity", "day")
+    if granularity not in analytics.GRANULARITIES:
+        return corsify(JsonResponse({"detail": "granularity must be day, week or month."}, status=400), request)
+    try:
+        start, end = parse_date_range(request)
+    except ValueError as exc:
+        return corsify(JsonResponse({"detail": str(exc)}, status=400), request)
+
+    return corsify(JsonResponse(analytics.revenue(start, end, granularity)), request)
+
+
+@csrf_exempt
+@replica_reads
+@admin_required
+def top_products_analytics(request):
+    """Best sellers between two dates, ranked ``?by=revenue`` or ``?by=units``."""
+    if request.method == "OPTIONS":
+        return handle_options(request)
+
+    by = request.GET.get("by", "revenue")
+    if by not in ("revenue", "units"):
+        return corsify(JsonResponse({"detail": "by must be revenue or units."}, status=400), request)
+    try:
+        start, end = parse_date_range(request)
+        limit = min(max(int(request.GET.get("limit", 10)), 1), 100)
+    except ValueError as exc:
+        return corsify(JsonResponse({"detail": str(exc)}, status=400), request)
+
+    return corsify(JsonResponse(analytics.top_products(start, end, limit, by)), request)
+
+
+@csrf_exempt
+@replica_reads
+@admin_required
+def daily_orders(request):
+    if request.method == "OPTIONS":
+        return handle_options(request)
+
+    def build():
+        counts = (
+            Order.objects.annotate(day=TruncDate("created_at"))
+            .values("day")
+            .order_by("day")
+            .annotate(total=models.Count("id"))
+        )
+        return [{"date": c["day"].isoformat() if c["day"] else None, "orders": c["total"]} for c in counts]
+
+    return cached_json(request, "orders", "daily", build, settings.ORDERS_CACHE_SECONDS)
+
+
+@csrf_exempt
+def event_stream(request):
+    """Server-Sent Events feed of order and stock changes.
+
+    Admins (an access token in the Authorization or X-Admin-Token header, or
+    a single-use ?ticket= from events/ticket/ since EventSource can't send
+    headers and the URL is logged) see every event;
+    ?order=<order_id> follows one order the caller may see (as in
+    order_detail); anyone else gets stock changes only. Reconnects resume
+    from Last-Event-ID.
+    """
+    if request.method == "OPTIONS":
+        return handle_options(request)
+
+    if request.method != "GET":
+        return corsify(JsonResponse({"detail": "Method not allowed."}, status=405), request)
+
+    ticket = request.GET.get("ticket")
+    if ticket is not None:
+        claims = auth.redeem_ticket(ticket)
+        if claims is None or claims["role"] != auth.ADMIN:
+            return corsify(JsonResponse({"detail": "Invalid or used stream ticket."}, status=401), request)
+    is_admin = ticket is not None or auth.is_admin(request)
+
+    order_id = request.GET.get("order")
+    if order_id:
+        try:
+            order_id = uuid.UUID(order_id)
+        except ValueError:
+            return corsify(JsonResponse({"detail": "Invalid order id."}, status=400), request)
+        if not is_admin and not can_view_order(request, order_id):
+            return corsify(JsonResponse({"detail": "Order not found."}, status=404), request)
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    try:
+        last_id = int(last_event_id) if last_event_id else events.latest_event_id()
+    except ValueError:
+        return corsify(JsonResponse({"detail": "Invalid Last-Event-ID."}, status=400), request)
+
+    event_filter = events.EventFilter(is_admin=is_admin, order_public_id=order_id)
+    # Under ASGI each client is a coroutine; under WSGI it occupies a worker thread.
+    if isinstance(request, ASGIRequest):
+        body = events.astream(event_filter, last_id)
+    else:
+        body = events.stream(event_filter, last_id)
+    response = StreamingHttpResponse(body, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return corsify(response, request)
+
+
+@csrf_exempt
+@admin_required
+def stream_ticket(request):
+    """A single-use ticket for opening the admin event stream (see event_stream)."""
+    if request.method == "OPTIONS":
+        return handle_options(request)
+
+    if request.method != "POST":
+        return corsify(JsonResponse({"detail": "Method not allowed."}, status=405), request)
+
+    return corsify(JsonResponse({"ticket": auth.issue_ticket(auth.authenticate(request))}), request)
+
+
+@csrf_exempt
+@admin_required
+def metrics(request):
+    """Per-process counters for admins (cache hits, coalesced requests, ...)."""
+    if request.method == "OPTIONS":
+        return handle_options(request)
+
+    return corsify(JsonResponse({"pid": os.getpid(), "singleflight": singleflight.stats()}), request)
 
 
 @csrf_exempt
@@ -379,7 +793,9 @@ def user_login(request):
     try:
         user = User.objects.get(username=username)
         if user.check_password(password):
-            return corsify(JsonResponse({"success": True, "message": "Login successful.", "user_id": user.id}), request)
+            request.session["user_id"] = user.id
+            data = {"success": True, "message": "Login successful.", "user_id": user.id, **auth.issue(user.id, auth.USER)}
+            return corsify(JsonResponse(data), request)
         else:
             return corsify(JsonResponse({"detail": "Invalid credentials."}, status=401), request)
     except User.DoesNotExist:
@@ -405,17 +821,50 @@ def admin_login(request):
     try:
         admin = Admin.objects.get(username=username)
         if admin.check_password(password):
-            return corsify(JsonResponse({"success": True, "message": "Admin login successful.", "admin_id": admin.id}), request)
+            data = {"success": True, "message": "Admin login successful.", "admin_id": admin.id, **auth.issue(admin.id, auth.ADMIN)}
+            return corsify(JsonResponse(data), request)
         else:
             return corsify(JsonResponse({"detail": "Invalid credentials."}, status=401), request)
     except Admin.DoesNotExist:
         return corsify(JsonResponse({"detail": "Admin not found."}, status=404), request)
 
 
+@csrf_exempt
+def auth_refresh(request):
+    """Exchange a refresh token for a new access/refresh pair. Each refresh token works once."""
+    if request.method == "OPTIONS":
+        return handle_options(request)
+
+    if request.method != "POST":
+        return corsify(JsonResponse({"detail": "Method not allowed."}, status=405), request)
+
+    tokens = auth.refresh(parse_json(request).get("refresh_token", ""))
+    if tokens is None:
+        return corsify(JsonResponse({"detail": "Invalid or expired refresh token."}, status=401), request)
+    return corsify(JsonResponse(tokens), request)
+
+
+@csrf_exempt
+def auth_logout(request):
+    """Revoke the request's access token and the ``refresh_token`` in the body, and end the session login."""
+    if request.method == "OPTIONS":
+        return handle_options(request)
+
+    if request.method != "POST":
+        return corsify(JsonResponse({"detail": "Method not allowed."}, status=405), request)
+
+    claims = auth.authenticate(request)
+    if claims is not None and claims["jti"]:
+        auth.revoke(claims)
+    refresh_claims = auth.verify(parse_json(request).get("refresh_token", ""), auth.REFRESH)
+    if refresh_claims is not None:
+        auth.revoke(refresh_claims, auth.REFRESH)
+    request.session.pop("user_id", None)
+    return corsify(JsonResponse({"success": True}), request)
+
+
 def redirect_to_error(request, code=500, title="Something Went Wrong", message="An unexpected error occurred.", details=""):
     """Helper function to redirect to error page with parameters."""
-    from urllib.parse import urlencode
-    
     params = {
         'code': code,
         'title': title,
@@ -425,15 +874,11 @@ def redirect_to_error(request, code=500, title="Something Went Wrong", message="
         params['details'] = details
     
     query_string = urlencode(params)
-    from django.shortcuts import redirect
     return redirect(f'/error.html?{query_string}')
 
 
 def handler404(request, exception):
     """Handle 404 - Page Not Found."""
-    from django.shortcuts import redirect
-    from urllib.parse import urlencode
-    
     params = urlencode({
         'code': '404',
         'title': 'Page Not Found',
@@ -445,9 +890,6 @@ def handler404(request, exception):
 
 def handler500(request):
     """Handle 500 - Internal Server Error."""
-    from django.shortcuts import redirect
-    from urllib.parse import urlencode
-    
     params = urlencode({
         'code': '500',
         'title': 'Internal Server Error',
@@ -459,9 +901,6 @@ def handler500(request):
 
 def handler403(request, exception=None):
     """Handle 403 - Forbidden."""
-    from django.shortcuts import redirect
-    from urllib.parse import urlencode
-    
     params = urlencode({
         'code': '403',
         'title': 'Access Forbidden',
@@ -473,9 +912,6 @@ def handler403(request, exception=None):
 
 def handler401(request, exception=None):
     """Handle 401 - Unauthorized."""
-    from django.shortcuts import redirect
-    from urllib.parse import urlencode
-    
     params = urlencode({
         'code': '401',
         'title': 'Unauthorized',
@@ -0,0 +1,107 @@
+"""Get a process ready to serve before it takes traffic.
+
+``preload()`` does the work that needs no database connection: importing
+modules that are otherwise loaded on first use, compiling URL patterns and
+loading templates. Run it in the gunicorn master before forking so workers
+share the result copy-on-write. ``warm_worker()`` runs in each worker and
+fills the caches the first requests would otherwise build.
+
+Both return ``{step: seconds}`` so startup cost can be tracked.
+"""
+
+import importlib
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+from django.urls import URLResolver, get_resolver
+
+from . import health, views
+
+
+logger = logging.getLogger(__name__)
+
+# Imported on first use by a request or a model field, not at startup.
+LAZY_MODULES = [
+    "PIL.Image",
+    "PIL.JpegImagePlugin",
+    "PIL.PngImagePlugin",
+    "django.core.files.images",
+    "django.contrib.sessions.backends.db",
+    "django.contrib.sessions.serializers",
+    "django.core.serializers.json",
+]
+
+
+def _timed(timings, name, func):
+    start = time.perf_counter()
+    try:
+        func()
+    except Exception:
+        logger.exception("Warmup step %s failed", name)
+    timings[name] = time.perf_counter() - start
+
+
+def import_lazy_modules():
+    for name in LAZY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+    # Creating the wrappers imports each database driver (e.g. psycopg2) without connecting.
+    for alias in connections:
+        connections[alias]
+    importlib.import_module(settings.SESSION_ENGINE)
+
+
+def _walk(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _walk(pattern.url_patterns)
+        else:
+            yield pattern
+
+
+def prime_url_resolver():
+    resolver = get_resolver()
+    # Populating the reverse map compiles every pattern's regex.
+    resolver.reverse_dict
+    for pattern in _walk(resolver.url_patterns):
+        pattern.pattern.regex
+
+
+def load_templates():
+    """Load every template served by a TemplateView route into the cached loader."""
+    for pattern in _walk(get_resolver().url_patterns):
+        template_name = getattr(pattern.callback, "view_initkwargs", {}).get("template_name")
+        if template_name:
+            try:
+                get_template(template_name)
+            except TemplateDoesNotExist:
+                logger.warning("Template %s not found during warmup", template_name)
+
+
+def prime_catalog_cache():
+    views.cached_body("catalog", "products", views.catalog, settings.CATALOG_CACHE_SECONDS)
+
+
+def preload():
+    """Warm everything that doesn't need the database. Safe to run before forking."""
+    timings = {}
+    _timed(timings, "imports", import_lazy_modules)
+    _timed(timings, "urls", prime_url_resolver)
+    _timed(timings, "templates", load_templates)
+    _timed(timings, "migrations", health.expected_migrations)
+    return timings
+
+
+def warm_worker():
+    """Warm the per-process caches. Run once in each worker after forking."""
+    timings = {}
+    _timed(timings, "catalog", prime_catalog_cache)
+    # Connections are per thread; request threads open their own.
+    connections.close_all()
+    return timings